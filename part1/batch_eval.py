@@ -0,0 +1,107 @@
+#
+# batch_eval.py : Vectorized evaluation of many Raichu boards at once with NumPy
+#
+# A board is encoded as an int8 array with one plane per piece (6 x N x N, 1 where the piece stands).
+# The weights are int32 planes of the same shape holding the value of every piece on every square
+# (material plus piece-square table, taken from raichu.evaluation_tables by default), so the evaluation
+# of a whole stack of boards is one matrix product. evaluate_successors builds the planes of all the
+# children of a board from the planes of the parent and scores them in one call.
+#
+# NumPy is optional: raichu.py keeps its incremental evaluation and does not need this module.
+#
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import raichu
+
+# Order of the planes
+PLANE_PIECES = 'wWbB@$'
+PLANE_INDEX = {piece: plane for (plane, piece) in enumerate(PLANE_PIECES)}
+
+# Weight planes of the current evaluation tables, by N
+weight_planes_cache = {}
+
+
+def require_numpy():
+    if np is None:
+        raise Exception("Batch evaluation needs NumPy (pip install numpy)")
+
+
+def board_planes(board):
+    '''
+    Encode a bitboard dict as an int8 array of shape (6, N, N)
+    '''
+    require_numpy()
+    N = board['N']
+    nbytes = (N*N + 7) // 8
+    planes = np.empty((len(PLANE_PIECES), N*N), dtype=np.int8)
+    for (plane, piece) in enumerate(PLANE_PIECES):
+        bits = np.unpackbits(np.frombuffer(board[piece].to_bytes(nbytes, 'little'), dtype=np.uint8),
+                             bitorder='little')
+        planes[plane] = bits[:N*N]
+    return planes.reshape(len(PLANE_PIECES), N, N)
+
+
+def stack_boards(boards):
+    '''
+    Encode a list of bitboard dicts of the same size as an int8 array of shape (len(boards), 6, N, N)
+    '''
+    require_numpy()
+    return np.stack([board_planes(board) for board in boards])
+
+
+def weight_planes(N, tables=None):
+    '''
+    The value of every piece on every square as int32 planes of shape (6, N, N), positive for white.
+    Without tables, the evaluation tables of raichu.py are used (and follow set_evaluation_weights).
+    '''
+    require_numpy()
+    if tables is not None:
+        return np.array([tables[piece] for piece in PLANE_PIECES], dtype=np.int32).reshape(len(PLANE_PIECES), N, N)
+
+    tables = raichu.evaluation_tables(N)
+    cached = weight_planes_cache.get(N)
+    if cached is None or cached[0] is not tables:
+        cached = (tables, weight_planes(N, tables))
+        weight_planes_cache[N] = cached
+    return cached[1]
+
+
+def batch_evaluate(stack, weights=None):
+    '''
+    Evaluate a stack of boards of shape (K, 6, N, N) in one call. Returns an int32 array of K values
+    from white's point of view, equal to raichu.evaluation_function of every board with the same weights.
+    '''
+    require_numpy()
+    stack = np.asarray(stack)
+    if weights is None:
+        weights = weight_planes(stack.shape[-1])
+    return stack.reshape(stack.shape[0], -1).astype(np.int32) @ weights.reshape(-1)
+
+
+def evaluate_successors(board, isWhiteTurn, weights=None):
+    '''
+    Score all the children of the board together. The planes of every child are a copy of the parent's
+    with the moved piece, the promotion and the captured piece changed, all set with one fancy index each.
+    Returns (moves, values) with the values from white's point of view.
+    '''
+    require_numpy()
+    moves = raichu.generate_moves(board, isWhiteTurn)
+    if not moves:
+        return (moves, np.zeros(0, dtype=np.int32))
+
+    N = board['N']
+    parent = board_planes(board).reshape(len(PLANE_PIECES), N*N)
+    stack = np.repeat(parent[np.newaxis], len(moves), axis=0)
+    rows = np.arange(len(moves))
+    raichu_piece = '@' if isWhiteTurn else '$'
+
+    stack[rows, [PLANE_INDEX[move[2]] for move in moves], [move[0] for move in moves]] = 0
+    stack[rows, [PLANE_INDEX[raichu_piece if move[5] else move[2]] for move in moves], [move[1] for move in moves]] = 1
+    captures = [k for (k, move) in enumerate(moves) if move[3] is not None]
+    if captures:
+        stack[captures, [PLANE_INDEX[moves[k][4]] for k in captures], [moves[k][3] for k in captures]] = 0
+
+    return (moves, batch_evaluate(stack.reshape(len(moves), len(PLANE_PIECES), N, N), weights))
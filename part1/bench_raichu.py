@@ -0,0 +1,368 @@
+#
+# bench_raichu.py : Benchmarks for the Raichu search
+#
+# Usage: python3 bench_raichu.py parallel [workers]
+#        python3 bench_raichu.py stats [N] [depth]
+#        python3 bench_raichu.py batch [N]
+#        python3 bench_raichu.py selective [N] [depth] [games]
+#        python3 bench_raichu.py scaling [sizes]
+#
+# parallel - time a fixed depth search of the starting position on 8x8 and 10x10 boards with
+#            the single process search and with the parallel search, and print the speedup; also print
+#            the processor time of the main process of the parallel search (the helpers run alongside it)
+#            and the speedup it gives over the processor time of the single process search, which is the
+#            speedup with a processor per worker even on a machine with fewer processors
+# stats    - search the starting position with the search statistics enabled and print them for
+#            every iteration, then time the same search with them disabled again
+# batch    - score the children of every position two plies from the start one by one (from scratch
+#            and incrementally) and with the NumPy batch evaluation of batch_eval.py, and check that
+#            the values agree
+# selective - search a set of positions to a fixed depth with each of the selective search features
+#            (null move, late-move reductions, futility pruning) alone and all together, and compare the
+#            nodes, the time and the moves with the full-width search; then play fixed depth games
+#            between the selective and the full-width search
+# scaling  - build the tables, run perft and search to a fixed depth on boards of several sizes (8,16,32 by
+#            default), from the starting position (more pieces on larger boards) and from the 8x8 starting
+#            position placed on the larger board (the same pieces), and print the nodes per second
+#
+import sys
+import time
+import os
+import random
+
+import raichu
+import perft
+
+# (N, depth) of the positions that are benchmarked
+PARALLEL_POSITIONS = [(8, 6), (10, 6), (8, 8), (10, 8)]
+
+
+def single_process_search(board_string, N, isWhiteTurn, depth):
+    '''
+    Iterative deepening up to depth in this process, the same way find_best_move does it.
+    The tables start empty, so that every run searches the same tree.
+    '''
+    raichu.tt_clear()
+    raichu.move_ordering['history'] = {}
+    raichu.ordering_new_search()
+    board = raichu.board_to_bitboards(raichu.string_to_board(board_string, N), N, isWhiteTurn)
+    raichu.search_info['nodes'] = 0
+    raichu.search_info['deadline'] = None
+    value = None
+    for d in range(1, depth+1):
+        if raichu.search_stats['enabled']:
+            raichu.search_stats_new_iteration()
+            nodes = raichu.search_info['nodes']
+            start = time.time()
+        (value, move, pv) = raichu.aspiration_search(board, d, isWhiteTurn, value)
+        if raichu.search_stats['enabled']:
+            raichu.search_stats_iteration(d, value, raichu.search_info['nodes'] - nodes, time.time() - start)
+    return (value, move, raichu.search_info['nodes'])
+
+
+def parallel_search(board_string, N, isWhiteTurn, depth, workers):
+    '''
+    Iterative deepening up to depth with the parallel search, the same way find_best_move does it, from an empty
+    shared table. Returns (value, move, nodes of all the processes, processor time of this process): the helpers
+    run alongside this process, so that is how long the search takes when every process has a processor of its own.
+    '''
+    start = time.process_time()
+    board = raichu.board_to_bitboards(raichu.string_to_board(board_string, N), N, isWhiteTurn)
+    root_moves = raichu.order_moves(raichu.generate_moves(board, isWhiteTurn), None, 0)
+    raichu.start_parallel_search(workers)
+    raichu.tt_clear()
+    raichu.move_ordering['history'] = {}
+    raichu.ordering_new_search()
+    raichu.search_info['nodes'] = 0
+    raichu.search_info['deadline'] = None
+    value = None
+    try:
+        for d in range(1, depth+1):
+            if d >= raichu.PARALLEL_MIN_DEPTH:
+                raichu.start_helpers(board_string, N, isWhiteTurn, root_moves, d)
+            try:
+                (value, move, pv) = raichu.aspiration_search(board, d, isWhiteTurn, value)
+            finally:
+                if d >= raichu.PARALLEL_MIN_DEPTH:
+                    raichu.stop_helpers()
+            root_moves.remove(move)
+            root_moves.insert(0, move)
+    finally:
+        raichu.use_local_table()
+    return (value, move, raichu.search_info['nodes'], time.process_time() - start)
+
+
+def bench_parallel(workers):
+    print('%-4s %-6s %-8s %10s %9s %10s %9s %8s %9s %9s' % ('N', 'depth', 'workers', 'nodes(1)', 'time(1)',
+                                                         'nodes(%d)' % workers, 'time(%d)' % workers, 'speedup',
+                                                         'main cpu', 'modelled'))
+    for (N, depth) in PARALLEL_POSITIONS:
+        board_string = raichu.initial_board_string(N)
+        # The workers are started with empty tables before anything is timed
+        raichu.shutdown_search_workers()
+        raichu.start_parallel_search(workers)
+        raichu.use_local_table()
+        for pool in raichu.parallel_search['pools']:
+            pool.submit(abs, 0).result()
+
+        start = time.time()
+        cpu_start = time.process_time()
+        (value, move, nodes) = single_process_search(board_string, N, True, depth)
+        single_cpu = time.process_time() - cpu_start
+        single_time = time.time() - start
+
+        start = time.time()
+        (parallel_value, parallel_move, parallel_nodes, main_cpu) = parallel_search(board_string, N, True, depth,
+                                                                                    workers)
+        parallel_time = time.time() - start
+
+        if parallel_value != value:
+            # the helpers change what the transposition table holds, and so what the selective search prunes
+            print('Value differs for N=%d: %s (single) vs %s (parallel)' % (N, value, parallel_value))
+
+        print('%-4d %-6d %-8d %10d %8.3fs %10d %8.3fs %8.2f %8.3fs %9.2f' % (
+            N, depth, workers, nodes, single_time, parallel_nodes, parallel_time, single_time / parallel_time,
+            main_cpu, single_cpu / main_cpu))
+    raichu.shutdown_search_workers()
+
+
+def bench_stats(N, depth):
+    board_string = raichu.initial_board_string(N)
+    start = time.time()
+    (value, move, nodes) = single_process_search(board_string, N, True, depth)
+    plain_time = time.time() - start
+
+    raichu.enable_search_stats()
+    start = time.time()
+    (stats_value, stats_move, stats_nodes) = single_process_search(board_string, N, True, depth)
+    stats_time = time.time() - start
+    iterations = raichu.search_stats['iterations']
+    raichu.disable_search_stats()
+
+    start = time.time()
+    single_process_search(board_string, N, True, depth)
+    disabled_time = time.time() - start
+
+    print('%-6s %-9s %10s %10s %10s %10s %9s %9s %6s %9s %9s %9s %9s %8s %8s %8s' % (
+        'depth', 'seldepth', 'nodes', 'interior', 'leaf', 'quiesce', 'cutoffs', 'q-cutoffs', 'ebf',
+        'time', 'movegen', 'eval', 'terminal', 'tt hits', 'tt fill', '1st cut'))
+    for iteration in iterations:
+        print('%-6d %-9d %10d %10d %10d %10d %9d %9d %6s %9.3f %9.3f %9.3f %9.3f %7.1f%% %7.1f%% %7.1f%%' % (
+            iteration['depth'], iteration['seldepth'], iteration['nodes'], iteration['interior_nodes'],
+            iteration['leaf_nodes'], iteration['quiescence_nodes'], iteration['cutoffs'],
+            iteration['quiescence_cutoffs'], '-' if iteration['ebf'] is None else '%.2f' % iteration['ebf'],
+            iteration['time'], iteration['movegen_time'], iteration['evaluation_time'], iteration['terminal_time'],
+            100*iteration['tt_hit_rate'], 100*iteration['tt_fill'], 100*iteration['first_move_cutoff_rate']))
+
+    if (stats_value, stats_move, stats_nodes) != (value, move, nodes):
+        print('The search with statistics differs: %s vs %s' % ((stats_value, stats_nodes), (value, nodes)))
+    print('time without statistics %.3fs, with statistics %.3fs, after disabling them %.3fs' % (
+        plain_time, stats_time, disabled_time))
+
+
+def evaluate_from_scratch(board):
+    '''
+    The evaluation summed over all the pieces, as board_to_bitboards does it
+    '''
+    tables = board['tables']
+    return sum(tables[piece][sq] for piece in 'wWbB@$' for sq in raichu.iter_bits(board[piece]))
+
+
+def bench_batch(N):
+    import batch_eval
+    if batch_eval.np is None:
+        print('NumPy is not installed, so there is no batch evaluation to benchmark')
+        return
+
+    # The positions two plies from the start, whose children are the leaves of a depth 3 search
+    board = raichu.board_to_bitboards(raichu.string_to_board(raichu.initial_board_string(N), N), N, True)
+    positions = []
+    for move in raichu.generate_moves(board, True):
+        raichu.make_move(board, move)
+        for reply in raichu.generate_moves(board, False):
+            raichu.make_move(board, reply)
+            positions.append(raichu.board_to_bitboards(raichu.bitboards_to_board(board), N, True))
+            raichu.unmake_move(board, reply)
+        raichu.unmake_move(board, move)
+
+    results = {}
+    for method in ('scratch', 'incremental', 'batch'):
+        start = time.time()
+        values = []
+        for position in positions:
+            if method == 'batch':
+                values.extend(batch_eval.evaluate_successors(position, True)[1].tolist())
+                continue
+            for move in raichu.generate_moves(position, True):
+                raichu.make_move(position, move)
+                values.append(evaluate_from_scratch(position) if method == 'scratch' else position['score'])
+                raichu.unmake_move(position, move)
+        results[method] = (values, time.time() - start)
+
+    leaves = len(results['scratch'][0])
+    print('%d positions, %d leaves' % (len(positions), leaves))
+    for (method, (values, seconds)) in results.items():
+        print('%-12s %8.3f s %10.2f us/leaf  %s' % (method, seconds, 1e6 * seconds / leaves,
+                                                   'ok' if values == results['scratch'][0] else 'MISMATCH'))
+
+
+# Settings of the selective search features compared by bench_selective
+SELECTIVE_FEATURES = ('NULL_MOVE_PRUNING', 'LATE_MOVE_REDUCTIONS', 'FUTILITY_PRUNING')
+SELECTIVE_CONFIGS = [
+    ('full width', ()),
+    ('null move', ('NULL_MOVE_PRUNING',)),
+    ('lmr', ('LATE_MOVE_REDUCTIONS',)),
+    ('futility', ('FUTILITY_PRUNING',)),
+    ('all', SELECTIVE_FEATURES),
+]
+
+
+def use_features(features):
+    for feature in SELECTIVE_FEATURES:
+        setattr(raichu, feature, feature in features)
+
+
+def random_positions(N, count, seed=1):
+    '''
+    The starting position and count-1 positions after 2 to 8 random moves from it
+    '''
+    rng = random.Random(seed)
+    positions = [(raichu.initial_board_string(N), True)]
+    while len(positions) < count:
+        board = raichu.board_to_bitboards(raichu.string_to_board(raichu.initial_board_string(N), N), N, True)
+        isWhiteTurn = True
+        for _ in range(rng.randint(2, 8)):
+            moves = raichu.generate_moves(board, isWhiteTurn)
+            if not moves:
+                break
+            raichu.make_move(board, rng.choice(moves))
+            isWhiteTurn = not isWhiteTurn
+        if not raichu.check_game_end(board, True) and not raichu.check_game_end(board, False):
+            positions.append((raichu.string_output(raichu.bitboards_to_board(board), N), isWhiteTurn))
+    return positions
+
+
+def play_fixed_depth_game(board_string, N, isWhiteTurn, depth, white_features, black_features, max_plies=200):
+    '''
+    Play a game in which every move is a fixed depth search. Returns white's score (1, 0.5 or 0).
+    '''
+    board = raichu.board_to_bitboards(raichu.string_to_board(board_string, N), N, isWhiteTurn)
+    for _ in range(max_plies):
+        use_features(white_features if isWhiteTurn else black_features)
+        (value, move, nodes) = single_process_search(raichu.string_output(raichu.bitboards_to_board(board), N),
+                                                     N, isWhiteTurn, depth)
+        if move is None:
+            return 0 if isWhiteTurn else 1
+        raichu.make_move(board, move)
+        if raichu.check_game_end(board, isWhiteTurn):
+            return 1 if isWhiteTurn else 0
+        isWhiteTurn = not isWhiteTurn
+    return 0.5
+
+
+def bench_selective(N, depth, games):
+    positions = random_positions(N, 12)
+    results = {}
+    print('%-12s %12s %10s %8s %12s %12s' % ('search', 'nodes', 'time', 'ratio', 'same move', 'value loss'))
+    for (name, features) in SELECTIVE_CONFIGS:
+        use_features(features)
+        start = time.time()
+        results[name] = [single_process_search(board_string, N, isWhiteTurn, depth)
+                         for (board_string, isWhiteTurn) in positions]
+        seconds = time.time() - start
+
+        # The moves are scored by the full-width search: how much worse than its own choice are they?
+        use_features(())
+        same = 0
+        loss = 0
+        for ((board_string, isWhiteTurn), (value, move, nodes), (full_value, full_move, full_nodes)) in zip(
+                positions, results[name], results['full width']):
+            if move == full_move:
+                same += 1
+                continue
+            board = raichu.board_to_bitboards(raichu.string_to_board(board_string, N), N, isWhiteTurn)
+            (move_value, _, _) = raichu.minimax(board, depth, isWhiteTurn, root_moves=[move])
+            loss += (full_value - move_value) if isWhiteTurn else (move_value - full_value)
+
+        nodes = sum(result[2] for result in results[name])
+        full_nodes = sum(result[2] for result in results['full width'])
+        print('%-12s %12d %9.2fs %8.2f %9d/%-2d %12.2f' % (name, nodes, seconds, nodes / full_nodes, same,
+                                                          len(positions), loss / len(positions)))
+
+    # Strength: the selective search against the full-width search at the same depth, both colours
+    score = 0
+    for game in range(games):
+        (board_string, isWhiteTurn) = positions[game // 2 % len(positions)]
+        if game % 2 == 0:
+            score += play_fixed_depth_game(board_string, N, isWhiteTurn, depth, SELECTIVE_FEATURES, ())
+        else:
+            score += 1 - play_fixed_depth_game(board_string, N, isWhiteTurn, depth, (), SELECTIVE_FEATURES)
+    if games:
+        print('selective vs full width at depth %d: %g/%d' % (depth, score, games))
+    use_features(SELECTIVE_FEATURES)
+
+
+# Depths of the scaling benchmark: perft and search, for the starting position of N and for the 8x8 pieces
+SCALING_DEPTHS = {'start': (2, 4), '8x8 pieces': (4, 6)}
+
+
+def small_board_on(N):
+    '''
+    The starting position of 8x8 on an N x N board: the four rows of each side at its own edge, centred
+    '''
+    small = raichu.initial_board_string(8)
+    board = [['.'] * N for _ in range(N)]
+    offset = (N - 8) // 2
+    for i in range(8):
+        row = i if i < 4 else N - 8 + i
+        for j in range(8):
+            board[row][offset + j] = small[i*8 + j]
+    return raichu.string_output(board, N)
+
+
+def bench_scaling(sizes):
+    print('%-4s %-11s %7s %8s %14s %12s %12s %12s' % ('N', 'position', 'pieces', 'tables', 'perft nodes/s',
+                                                      'search nodes', 'time', 'nodes/s'))
+    for N in sizes:
+        start = time.time()
+        raichu.move_tables(N)
+        raichu.zobrist_keys(N)
+        raichu.evaluation_tables(N)
+        tables_time = time.time() - start
+        for (name, board_string) in (('start', raichu.initial_board_string(N)), ('8x8 pieces', small_board_on(N))):
+            (perft_depth, search_depth) = SCALING_DEPTHS[name]
+            board = raichu.board_to_bitboards(raichu.string_to_board(board_string, N), N, True)
+            start = time.time()
+            perft_nodes = perft.perft(board, perft_depth, True)
+            perft_time = time.time() - start
+
+            start = time.time()
+            (value, move, nodes) = single_process_search(board_string, N, True, search_depth)
+            search_time = time.time() - start
+            print('%-4d %-11s %7d %7.3fs %14d %12d %11.3fs %12d' % (
+                N, name, len(board['squares']), tables_time, perft_nodes / perft_time, nodes, search_time,
+                nodes / search_time))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in ('parallel', 'stats', 'batch', 'selective', 'scaling'):
+        raise Exception("Usage: bench_raichu.py parallel [workers] | bench_raichu.py stats [N] [depth] | "
+                        "bench_raichu.py batch [N] | bench_raichu.py selective [N] [depth] [games] | "
+                        "bench_raichu.py scaling [sizes]")
+
+    if sys.argv[1] == 'parallel':
+        workers = int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1)
+        bench_parallel(workers)
+    elif sys.argv[1] == 'stats':
+        N = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+        depth = int(sys.argv[3]) if len(sys.argv) > 3 else 6
+        bench_stats(N, depth)
+    elif sys.argv[1] == 'batch':
+        bench_batch(int(sys.argv[2]) if len(sys.argv) > 2 else 8)
+    elif sys.argv[1] == 'selective':
+        N = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+        depth = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+        games = int(sys.argv[4]) if len(sys.argv) > 4 else 4
+        bench_selective(N, depth, games)
+    elif sys.argv[1] == 'scaling':
+        bench_scaling([int(size) for size in sys.argv[2].split(',')] if len(sys.argv) > 2 else [8, 16, 32])
@@ -0,0 +1,240 @@
+#
+# build_tables.py : Build the opening book and the endgame tablebase used by raichu.py
+#
+# Usage: python3 build_tables.py book N plies depth
+#        python3 build_tables.py tablebase sizes [pieces]
+#
+# book      - search every position up to plies moves from the starting position of an N x N board
+#             to the given depth and add the moves to raichu_book.txt (the entries of other sizes are kept)
+# tablebase - solve every position with at most pieces pieces (TABLEBASE_MAX_PIECES by default) on the
+#             given board sizes (e.g. 4,5,6) by retrograde analysis and write raichu_tablebase.bin
+#
+import sys
+import os
+import time
+import json
+import itertools
+
+import raichu
+
+
+def deep_search(board, isWhiteTurn, depth):
+    '''
+    Iterative deepening up to depth without a time limit. Returns (value, move).
+    '''
+    raichu.tt_new_search()
+    raichu.ordering_new_search()
+    raichu.search_info['deadline'] = None
+    value = None
+    for d in range(1, depth+1):
+        (value, move, pv) = raichu.aspiration_search(board, d, isWhiteTurn, value)
+    return (value, move)
+
+
+def book_positions(N, plies):
+    '''
+    All the positions (board string, isWhiteTurn) reached in up to plies moves from the starting position
+    '''
+    start = raichu.initial_board_string(N)
+    positions = {}
+    frontier = [(start, True)]
+    for ply in range(plies+1):
+        next_frontier = []
+        for (board_string, isWhiteTurn) in frontier:
+            board = raichu.board_to_bitboards(raichu.string_to_board(board_string, N), N, isWhiteTurn)
+            if board['hash'] in positions or raichu.check_game_end(board, True) or raichu.check_game_end(board, False):
+                continue
+            positions[board['hash']] = (board_string, isWhiteTurn)
+            if ply < plies:
+                for move in raichu.generate_moves(board, isWhiteTurn):
+                    raichu.make_move(board, move)
+                    next_frontier.append((raichu.string_output(raichu.bitboards_to_board(board), N), not isWhiteTurn))
+                    raichu.unmake_move(board, move)
+        frontier = next_frontier
+    return list(positions.values())
+
+
+def build_book(N, plies, depth):
+    book = raichu.load_book() if os.path.exists(raichu.BOOK_FILE) else {}
+    book = {key: entry for (key, entry) in book.items() if key[0] != N}
+
+    positions = book_positions(N, plies)
+    raichu.tt_clear()
+    start_time = time.time()
+    for (count, (board_string, isWhiteTurn)) in enumerate(positions, 1):
+        board = raichu.board_to_bitboards(raichu.string_to_board(board_string, N), N, isWhiteTurn)
+        (value, move) = deep_search(board, isWhiteTurn, depth)
+        if move is not None:
+            book[(N, board['hash'])] = (move[0], move[1], value)
+        print('[%d/%d] %s %s: %s (%d) %.1fs' % (count, len(positions), 'w' if isWhiteTurn else 'b', board_string,
+                                               raichu.move_to_string(move, N) if move else '-', value,
+                                               time.time() - start_time), flush=True)
+
+    with open(raichu.BOOK_FILE, "w") as f:
+        f.write('# Opening book of raichu.py, built with build_tables.py: N hash from_sq to_sq value\n')
+        for ((book_N, hash_value), (from_sq, to_sq, value)) in sorted(book.items()):
+            f.write('%d %d %d %d %d\n' % (book_N, hash_value, from_sq, to_sq, value))
+    print('%d entries for N=%d written to %s' % (len(positions), N, raichu.BOOK_FILE))
+
+
+def signatures(max_pieces):
+    '''
+    All the material signatures with pieces of both sides, in the order they have to be solved:
+    a capture leads to a signature with fewer pieces and a promotion to one with more raichus
+    '''
+    result = []
+    for count in range(2, max_pieces+1):
+        for pieces in itertools.combinations_with_replacement(raichu.TABLEBASE_PIECES, count):
+            signature = ''.join(pieces)
+            if any(piece in raichu.WHITE_PIECES for piece in signature) \
+                    and any(piece in raichu.BLACK_PIECES for piece in signature):
+                result.append(signature)
+    result.sort(key=lambda signature: (len(signature), -sum(piece in '@$' for piece in signature)))
+    return result
+
+
+def signature_positions(N, signature):
+    '''
+    Yield the squares of the pieces for every position of the signature. Pieces of the same kind are on
+    ascending squares (as in tablebase_index) and no pichu or pikachu stands on its promotion row.
+    '''
+    for squares in itertools.product(range(N*N), repeat=len(signature)):
+        if len(set(squares)) != len(squares):
+            continue
+        if any(signature[i] == signature[i+1] and squares[i] > squares[i+1] for i in range(len(squares)-1)):
+            continue
+        if any((piece in 'wW' and sq // N == N-1) or (piece in 'bB' and sq // N == 0)
+               for (piece, sq) in zip(signature, squares)):
+            continue
+        yield squares
+
+
+def solve_signature(N, signature, solved):
+    '''
+    Retrograde analysis of one signature. All the moves are generated once to find the positions that are
+    decided by a move into another (solved) table and to link every position to its parents in this table.
+    Then the results spread backwards from the decided positions in order of plies: a position is won in
+    n+1 when one of its children is lost in n, and lost in n+1 when all its children are won, the longest
+    in n. Positions that are never decided are draws.
+    '''
+    table = bytearray([raichu.TB_INVALID]) * (2 * (N*N)**len(signature))
+    parents = {}
+    remaining = {}
+    longest = {}
+    undecidable = set()
+    # buckets[plies] holds the (index, won) results that are known to take that many plies
+    buckets = {}
+
+    for squares in signature_positions(N, signature):
+        matrix = [['.'] * N for _ in range(N)]
+        for (piece, sq) in zip(signature, squares):
+            matrix[sq // N][sq % N] = piece
+        for isWhiteTurn in (True, False):
+            board = raichu.board_to_bitboards([row[:] for row in matrix], N, isWhiteTurn)
+            index = raichu.tablebase_index(board, isWhiteTurn)
+            table[index] = raichu.TB_DRAW
+
+            moves = raichu.generate_moves(board, isWhiteTurn)
+            children = 0
+            won = False
+            draw = False
+            longest[index] = 0
+            for move in moves:
+                raichu.make_move(board, move)
+                if raichu.check_game_end(board, isWhiteTurn):
+                    child = raichu.TB_LOSS
+                else:
+                    child_signature = raichu.tablebase_signature(board)
+                    child_index = raichu.tablebase_index(board, not isWhiteTurn)
+                    if child_signature == signature:
+                        parents.setdefault(child_index, []).append(index)
+                        children += 1
+                        child = None
+                    else:
+                        child = solved[child_signature][child_index]
+                raichu.unmake_move(board, move)
+
+                if child is None:
+                    continue
+                if child >= raichu.TB_LOSS:
+                    buckets.setdefault(child - raichu.TB_LOSS + 1, []).append((index, True))
+                    won = True
+                elif child == raichu.TB_DRAW:
+                    draw = True
+                else:
+                    longest[index] = max(longest[index], child)
+
+            remaining[index] = children
+            if won or draw:
+                undecidable.add(index)
+            elif not moves:
+                # A side that cannot move has lost
+                buckets.setdefault(0, []).append((index, False))
+            elif children == 0:
+                buckets.setdefault(longest[index] + 1, []).append((index, False))
+
+    plies = 0
+    while buckets:
+        for (index, won) in buckets.pop(plies, []):
+            if table[index] != raichu.TB_DRAW:
+                continue
+            if plies >= raichu.TB_LOSS - 1:
+                raise Exception("Result too long for the tablebase: %d plies" % plies)
+            table[index] = plies if won else raichu.TB_LOSS + plies
+            for parent in parents.get(index, []):
+                if table[parent] != raichu.TB_DRAW:
+                    continue
+                if not won:
+                    buckets.setdefault(plies + 1, []).append((parent, True))
+                else:
+                    remaining[parent] -= 1
+                    longest[parent] = max(longest[parent], plies)
+                    if remaining[parent] == 0 and parent not in undecidable:
+                        buckets.setdefault(longest[parent] + 1, []).append((parent, False))
+        plies += 1
+
+    return table
+
+
+def build_tablebase(sizes, max_pieces):
+    tables = []
+    for N in sizes:
+        solved = {}
+        for signature in signatures(max_pieces):
+            start_time = time.time()
+            solved[signature] = solve_signature(N, signature, solved)
+            table = solved[signature]
+            print('N=%d %-4s %9d positions: %7d won %7d lost %7d drawn  %.1fs' % (
+                N, signature, len(table) - table.count(raichu.TB_INVALID),
+                sum(1 for value in table if 0 < value < raichu.TB_LOSS),
+                sum(1 for value in table if raichu.TB_LOSS <= value < raichu.TB_INVALID),
+                table.count(raichu.TB_DRAW), time.time() - start_time), flush=True)
+            tables.append(('%d:%s' % (N, signature), table))
+
+    header = {}
+    offset = 0
+    for (key, table) in tables:
+        header[key] = offset
+        offset += len(table)
+    header = json.dumps(header).encode()
+    with open(raichu.TABLEBASE_FILE, "wb") as f:
+        f.write(raichu.TABLEBASE_MAGIC)
+        f.write(len(header).to_bytes(4, 'little'))
+        f.write(header)
+        for (key, table) in tables:
+            f.write(table)
+    print('%d tables (%d bytes) written to %s' % (len(tables), 8 + len(header) + offset, raichu.TABLEBASE_FILE))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 5 and sys.argv[1] == 'book':
+        build_book(int(sys.argv[2]), int(sys.argv[3]), int(sys.argv[4]))
+    elif len(sys.argv) in (3, 4) and sys.argv[1] == 'tablebase':
+        sizes = [int(size) for size in sys.argv[2].split(',')]
+        max_pieces = int(sys.argv[3]) if len(sys.argv) == 4 else raichu.TABLEBASE_MAX_PIECES
+        if max(sizes) > raichu.TABLEBASE_MAX_N or max_pieces > raichu.TABLEBASE_MAX_PIECES:
+            raise Exception("raichu.py only looks up boards up to N=%d with up to %d pieces" % (
+                raichu.TABLEBASE_MAX_N, raichu.TABLEBASE_MAX_PIECES))
+        build_tablebase(sizes, max_pieces)
+    else:
+        raise Exception("Usage: build_tables.py book N plies depth | build_tables.py tablebase sizes [pieces]")
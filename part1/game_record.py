@@ -0,0 +1,191 @@
+#
+# game_record.py : Compact binary, append-only records of Raichu games
+#
+# Usage: python3 game_record.py show file [first [count]]
+#        python3 game_record.py summary file
+#
+# show    - print games (all of them by default) with the moves in compact notation and the value,
+#           depth and nodes of every search
+# summary - count the games, plies, results and nodes of a file, reading one game at a time
+#
+# A file starts with RECORD_MAGIC and then holds one record per game, appended as a single write when the
+# game is over, so a file can be written by one process while another reads it. A record is
+#
+#   length       uint32  bytes of the record after this field
+#   header       GAME_HEADER: N, first player (0 white, 1 black), result (1 white won, -1 black won, 0 draw),
+#                whether the start position is stored, bytes of the tags and number of moves
+#   start        the start position, two squares per byte (SQUARE_CODES), only when it is not the
+#                initial position of N
+#   tags         JSON object with anything else about the game (engines, time control, ...)
+#   moves        MOVE_ENTRY per ply: from and to square, flags (capture, promotion), depth of the search,
+#                its value (from white's point of view) and its nodes
+#
+# The piece that moves and the captured square are not stored: they follow from the position, and
+# replay_game finds them again. A record that was cut short (a writer that died) ends the file for the reader.
+#
+import sys
+import os
+import struct
+import json
+
+import raichu
+
+RECORD_MAGIC = b'RGR1'
+RECORD_LENGTH = struct.Struct('<I')
+GAME_HEADER = struct.Struct('<BBbBHH')
+MOVE_ENTRY = struct.Struct('<HHBBiI')
+
+MOVE_CAPTURE = 1
+MOVE_PROMOTION = 2
+
+# Code of every square of a stored start position, two squares per byte (low nibble first)
+SQUARE_CODES = '.wWbB@$'
+
+RESULTS = {'1-0': 1, '0-1': -1, '1/2-1/2': 0}
+RESULT_NAMES = {value: name for (name, value) in RESULTS.items()}
+
+
+def pack_board(board_string):
+    codes = [SQUARE_CODES.index(square) for square in board_string]
+    if len(codes) % 2:
+        codes.append(0)
+    return bytes(codes[i] | codes[i+1] << 4 for i in range(0, len(codes), 2))
+
+
+def unpack_board(data, N):
+    squares = []
+    for byte in data:
+        squares.append(SQUARE_CODES[byte & 15])
+        squares.append(SQUARE_CODES[byte >> 4])
+    return ''.join(squares[:N*N])
+
+
+def encode_game(N, player, start, result, moves, tags=None):
+    '''
+    The record of one game. moves holds (move, value, depth, nodes) for every ply, with the move as
+    generate_moves returns it; result is '1-0', '0-1' or '1/2-1/2'.
+    '''
+    stored_start = b'' if start == raichu.initial_board_string(N) else pack_board(start)
+    tags = json.dumps(tags or {}, separators=(',', ':')).encode()
+    parts = [GAME_HEADER.pack(N, player == 'b', RESULTS[result], bool(stored_start), len(tags), len(moves)),
+             stored_start, tags]
+    for ((from_sq, to_sq, piece, captured_sq, captured_piece, promotion), value, depth, nodes) in moves:
+        flags = (MOVE_CAPTURE if captured_sq is not None else 0) | (MOVE_PROMOTION if promotion else 0)
+        parts.append(MOVE_ENTRY.pack(from_sq, to_sq, flags, depth, value, nodes))
+    record = b''.join(parts)
+    return RECORD_LENGTH.pack(len(record)) + record
+
+
+def append_game(f, record):
+    '''
+    Append a record from encode_game to a file opened with "ab", starting the file if it is empty
+    '''
+    if f.tell() == 0:
+        f.write(RECORD_MAGIC)
+    f.write(record)
+    f.flush()
+
+
+def decode_game(data):
+    '''
+    The game of a record (without its length) as a dict. The moves are (from_sq, to_sq, flags, depth,
+    value, nodes) tuples.
+    '''
+    (N, black_first, result, has_start, tags_length, move_count) = GAME_HEADER.unpack_from(data)
+    offset = GAME_HEADER.size
+    if has_start:
+        start_length = (N*N + 1) // 2
+        start = unpack_board(data[offset:offset+start_length], N)
+        offset += start_length
+    else:
+        start = raichu.initial_board_string(N)
+    tags = json.loads(data[offset:offset+tags_length])
+    offset += tags_length
+    moves = list(MOVE_ENTRY.iter_unpack(data[offset:offset + move_count*MOVE_ENTRY.size]))
+    return {'N': N, 'player': 'b' if black_first else 'w', 'start': start, 'result': RESULT_NAMES[result],
+            'tags': tags, 'moves': moves}
+
+
+def read_games(filename):
+    '''
+    Yield the games of a file one at a time, so that only one record is in memory
+    '''
+    with open(filename, 'rb') as f:
+        magic = f.read(len(RECORD_MAGIC))
+        if not magic:
+            return
+        if magic != RECORD_MAGIC:
+            raise Exception("Not a game record file: " + filename)
+        while True:
+            length = f.read(RECORD_LENGTH.size)
+            if len(length) < RECORD_LENGTH.size:
+                return
+            (length,) = RECORD_LENGTH.unpack(length)
+            data = f.read(length)
+            if len(data) < length:
+                return
+            yield decode_game(data)
+
+
+def replay_game(game):
+    '''
+    Play the moves of a game from its start position. Yields (board, isWhiteTurn, move, value, depth, nodes)
+    for every ply with the board before the move (the same dict every time, updated in place).
+    '''
+    N = game['N']
+    isWhiteTurn = game['player'] == 'w'
+    board = raichu.board_to_bitboards(raichu.string_to_board(game['start'], N), N, isWhiteTurn)
+    for (from_sq, to_sq, flags, depth, value, nodes) in game['moves']:
+        for move in raichu.generate_moves(board, isWhiteTurn):
+            if move[0] == from_sq and move[1] == to_sq:
+                break
+        else:
+            raise Exception("Illegal move %s in the record" % (raichu.square_name(from_sq, N) + '-' +
+                                                               raichu.square_name(to_sq, N)))
+        yield (board, isWhiteTurn, move, value, depth, nodes)
+        raichu.make_move(board, move)
+        isWhiteTurn = not isWhiteTurn
+
+
+def show_games(filename, first=1, count=None):
+    for (number, game) in enumerate(read_games(filename), 1):
+        if number < first:
+            continue
+        if count is not None and number >= first + count:
+            break
+        N = game['N']
+        print('game %d: %dx%d %s to move, %s, %d plies %s' % (number, N, N, game['player'], game['result'],
+                                                              len(game['moves']), json.dumps(game['tags'])))
+        if game['start'] != raichu.initial_board_string(N):
+            print(game['start'])
+        plies = ['%s {%+d d%d %dn}' % (raichu.move_notation(move, N), value, depth, nodes)
+                 for (board, isWhiteTurn, move, value, depth, nodes) in replay_game(game)]
+        print(' '.join(plies))
+
+
+def summarize_games(filename):
+    games = 0
+    plies = 0
+    nodes = 0
+    depths = 0
+    results = {name: 0 for name in RESULTS}
+    for game in read_games(filename):
+        games += 1
+        plies += len(game['moves'])
+        nodes += sum(entry[5] for entry in game['moves'])
+        depths += sum(entry[3] for entry in game['moves'])
+        results[game['result']] += 1
+    print('%d games, %d plies, %s' % (games, plies, ' '.join('%s %d' % item for item in results.items())))
+    if plies:
+        print('%.1f average depth, %d nodes per move, %.1f bytes per ply' % (
+            depths / plies, nodes / plies, os.path.getsize(filename) / plies))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) in (3, 4, 5) and sys.argv[1] == 'show':
+        show_games(sys.argv[2], int(sys.argv[3]) if len(sys.argv) > 3 else 1,
+                   int(sys.argv[4]) if len(sys.argv) > 4 else None)
+    elif len(sys.argv) == 3 and sys.argv[1] == 'summary':
+        summarize_games(sys.argv[2])
+    else:
+        raise Exception("Usage: game_record.py show file [first [count]] | game_record.py summary file")
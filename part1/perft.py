@@ -0,0 +1,124 @@
+#
+# perft.py : Move generation test and benchmark for raichu.py
+#
+# perft counts the leaf nodes of the full game tree (every move, no pruning) to a given depth.
+# A different count than the reference means that the move generator (or make/unmake) changed
+# behaviour, and the nodes per second track the speed of the move generator.
+#
+# Usage: python3 perft.py N player board depth [divide]
+#        python3 perft.py reference
+#
+# divide    - print the count below every root move, to find the move that is wrong
+# reference - run the reference positions and check the counts against the known values
+#
+import sys
+import time
+
+import raichu
+
+# (N, player, board, leaf counts for depth 1, 2, ...)
+# The counts were produced with the original list based successors() of raichu.py.
+REFERENCE_POSITIONS = [
+    (8, 'w', '........W.W.W.W..w.w.w.w................b.b.b.b..B.B.B.B........', [22, 484, 10087, 209430]),
+    (8, 'b', '........W.W.W.W..w.w.w.w................b.b.b.b..B.B.B.B........', [22, 484, 10087]),
+    (8, 'w', '.....W....W.W..@.w...w.w..w......b...b..b.b...B.....B...$.......', [29, 719, 21369]),
+    (8, 'b', '.....W....W.W..@.w...w.w..w......b...b..b.b...B.....B...$.......', [25, 721, 18172]),
+    (5, 'w', '.W.W.w.w.........b.b.B.B.', [11, 117, 1096, 10078]),
+    (6, 'w', '......W.W.W..w.w.wb.b.b..B.B.B......', [11, 126, 1349, 14884]),
+    (7, 'b', '...@.....w.....B.b.$..W.........w.....b.b..$.....', [34, 649, 23123]),
+    (7, 'w', '...@.....w.....B.b.$..W.........w.....b.b..$.....', [19, 637, 13931]),
+    (10, 'w', '..........W.W.W.W.W..w.w.w.w.w........................................b.b.b.b.b..B.B.B.B.B..........',
+     [28, 784, 21112]),
+]
+
+
+def perft(board, depth, isWhiteTurn):
+    '''
+    Count the leaf nodes of the game tree below the board to the given depth
+    '''
+    moves = raichu.generate_moves(board, isWhiteTurn)
+    if depth == 1:
+        return len(moves)
+
+    nodes = 0
+    for move in moves:
+        raichu.make_move(board, move)
+        nodes += perft(board, depth-1, not isWhiteTurn)
+        raichu.unmake_move(board, move)
+    return nodes
+
+
+def divide(board, depth, isWhiteTurn):
+    '''
+    Return the leaf count below every root move as a list of (move, count)
+    '''
+    counts = []
+    for move in raichu.generate_moves(board, isWhiteTurn):
+        raichu.make_move(board, move)
+        counts.append((move, perft(board, depth-1, not isWhiteTurn) if depth > 1 else 1))
+        raichu.unmake_move(board, move)
+    return counts
+
+
+def run_perft(N, player, board_string, depth, show_divide=False):
+    board = raichu.board_to_bitboards(raichu.string_to_board(board_string, N), N, player == 'w')
+    start = time.time()
+    if show_divide:
+        counts = divide(board, depth, player == 'w')
+        for (move, count) in sorted(counts, key=lambda item: raichu.move_to_string(item[0], N)):
+            print('%-28s %d' % (raichu.move_to_string(move, N), count))
+        nodes = sum(count for (move, count) in counts)
+    else:
+        nodes = perft(board, depth, player == 'w')
+    elapsed = time.time() - start
+
+    print('depth %d: %d nodes in %.3f s (%d nodes/s)' % (depth, nodes, elapsed, nodes / max(elapsed, 1e-9)))
+
+
+def run_reference():
+    '''
+    Check every reference position at every depth. Returns True when all the counts match.
+    '''
+    all_passed = True
+    total_nodes = 0
+    total_time = 0.0
+    for (N, player, board_string, expected_counts) in REFERENCE_POSITIONS:
+        board = raichu.board_to_bitboards(raichu.string_to_board(board_string, N), N, player == 'w')
+        for (depth, expected) in enumerate(expected_counts, 1):
+            start = time.time()
+            nodes = perft(board, depth, player == 'w')
+            elapsed = time.time() - start
+            total_nodes += nodes
+            total_time += elapsed
+
+            passed = nodes == expected
+            all_passed = all_passed and passed
+            print('%s N=%-2d %s depth %d: %9d (expected %9d) %10d nodes/s  %s' % (
+                'ok  ' if passed else 'FAIL', N, player, depth, nodes, expected,
+                nodes / max(elapsed, 1e-9), board_string))
+
+    print('%s: %d nodes in %.3f s (%d nodes/s)' % ('passed' if all_passed else 'FAILED', total_nodes, total_time,
+                                                    total_nodes / max(total_time, 1e-9)))
+    return all_passed
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 2 and sys.argv[1] == 'reference':
+        sys.exit(0 if run_reference() else 1)
+
+    if len(sys.argv) not in (5, 6) or (len(sys.argv) == 6 and sys.argv[5] != 'divide'):
+        raise Exception("Usage: perft.py N player board depth [divide] | perft.py reference")
+
+    (N, player, board_string, depth) = sys.argv[1:5]
+    N = int(N)
+    depth = int(depth)
+    if player not in "wb":
+        raise Exception("Invalid player.")
+
+    if len(board_string) != N*N or 0 in [c in "wb.WB@$" for c in board_string]:
+        raise Exception("Bad board string.")
+
+    if depth < 1:
+        raise Exception("Depth should be at least 1.")
+
+    run_perft(N, player, board_string, depth, len(sys.argv) == 6)
@@ -7,7 +7,15 @@
 # The code for minimax was developed after referring to following youtube video: https://youtu.be/l-hh51ncgDI
 # This includes a basic structure of minimax along with alpha beta pruning
 import sys
-from copy import deepcopy
+import time
+import random
+import threading
+import os
+import mmap
+import json
+import ctypes
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 
 
 def board_to_string(board, N):
@@ -35,6 +43,18 @@ def string_to_board(string_value, N):
     return board
 
 
+def initial_board_string(N):
+    '''
+    Return the starting board for an N x N game: a row of pikachus and a row of pichus on each side
+    '''
+    rows = ['.' * N for _ in range(N)]
+    rows[1] = ('W.' * N)[:N]
+    rows[2] = ('.w' * N)[:N]
+    rows[N-3] = ('b.' * N)[:N]
+    rows[N-2] = ('.B' * N)[:N]
+    return ''.join(rows)
+
+
 def is_valid_index(i, j, N):
     '''
     This method will check if the given index is inside the scope of the board
@@ -68,55 +88,332 @@ def find_count(board):
     return pieces_count
 
 
-def return_modified_board(board, oldPos, newPos, isAttack = False, attackPos = None, returnCopy = True):
+# Bitboard representation:
+# The board is held as a dict with one python integer per piece type ('w', 'W', 'b', 'B', '@', '$').
+# Square (i, j) is bit i*N + j. Move generation walks the pieces (the set bits) and reads the squares
+# each piece can reach from tables that are precomputed once per board size, so no bounds checks
+# are needed while searching.
+# Next to the bitboards, 'squares' is a sparse board: a dict from every occupied square to its piece.
+# Move generation looks the squares up there, so a move costs the same on every board size: an N x N
+# bitboard is an N*N bit integer, and masking it costs more the larger the board gets.
+
+WHITE_PIECES = 'wW@'
+BLACK_PIECES = 'bB$'
+
+# Directions as (row step, column step). White moves forward by going down the rows (i+1).
+PICHU_DIRECTIONS = {'w': ((1, -1), (1, 1)), 'b': ((-1, -1), (-1, 1))}
+PIKACHU_DIRECTIONS = {'w': ((1, 0), (0, -1), (0, 1)), 'b': ((-1, 0), (0, -1), (0, 1))}
+RAICHU_DIRECTIONS = ((1, 0), (-1, 0), (0, -1), (0, 1), (1, -1), (1, 1), (-1, -1), (-1, 1))
+
+move_tables_cache = {}
+
+
+def ray(i, j, di, dj, length, N):
     '''
-    Return the modified board by swapping the positions and other options specified like: 	
-    whether it's in attack mode or whether to return a copy of board etc.
+    Return the squares from (i, j) in the direction (di, dj), at most length squares long
     '''
+    squares = []
+    for k in range(1, length+1):
+        if not is_valid_index(i + k*di, j + k*dj, N):
+            break
+        squares.append((i + k*di)*N + j + k*dj)
+    return tuple(squares)
 
-    if returnCopy:
-        new_board = deepcopy(board)
-        new_board[oldPos[0]][oldPos[1]], new_board[newPos[0]][newPos[1]] = \
-        new_board[newPos[0]][newPos[1]], new_board[oldPos[0]][oldPos[1]]
 
-        if isAttack:
-            new_board[attackPos[0]][attackPos[1]] = '.'
+def move_tables(N):
+    '''
+    Return the move tables for a board of size N, indexed by square:
+    'pichu'   - per side, the diagonal step and the jump landing behind it (None when the landing
+                is off the board) for both forward diagonals
+    'pikachu' - per side, the first three squares forward, left and right
+    'raichu'  - the rays in all 8 directions up to the edge of the board
+    'promotion' - per side, whether a pichu or pikachu that lands on the square evolves
+    '''
+    if N in move_tables_cache:
+        return move_tables_cache[N]
 
-        check_raichu_evolution(new_board, len(new_board))
+    tables = {
+        'pichu': {'w': [], 'b': []},
+        'pikachu': {'w': [], 'b': []},
+        'raichu': [],
+        'promotion': {'w': [], 'b': []},
+    }
+    for i in range(N):
+        for j in range(N):
+            for side in 'wb':
+                steps = []
+                for (di, dj) in PICHU_DIRECTIONS[side]:
+                    squares = ray(i, j, di, dj, 2, N)
+                    if squares:
+                        steps.append((squares[0], squares[1] if len(squares) > 1 else None))
+                tables['pichu'][side].append(steps)
 
-        return new_board
-    else:
-        board[oldPos[0]][oldPos[1]], board[newPos[0]][newPos[1]] = board[newPos[0]][newPos[1]], board[oldPos[0]][oldPos[1]]
-        
-        if isAttack:
-            board[attackPos[0]][attackPos[1]] = '.'
+                rays = [ray(i, j, di, dj, 3, N) for (di, dj) in PIKACHU_DIRECTIONS[side]]
+                tables['pikachu'][side].append([r for r in rays if r])
 
-        check_raichu_evolution(board, len(board))
+                tables['promotion'][side].append(i == (N-1 if side == 'w' else 0))
 
-        return board
+            rays = [ray(i, j, di, dj, N, N) for (di, dj) in RAICHU_DIRECTIONS]
+            tables['raichu'].append([r for r in rays if r])
 
+    move_tables_cache[N] = tables
+    return tables
 
-def evaluation_function(board_state):
+
+def iter_bits(bb):
+    '''
+    Yield the square index of every set bit of the bitboard
+    '''
+    while bb:
+        low = bb & -bb
+        yield low.bit_length() - 1
+        bb ^= low
+
+
+# Zobrist hashing: one random 64 bit key per (piece, square) plus one for black to move.
+# The hash of a position is the xor of the keys of all pieces on it. A fixed seed keeps the
+# keys (and so the hashes) the same from one run to the next.
+zobrist_keys_cache = {}
+
+
+def zobrist_keys(N):
+    '''
+    Return the zobrist keys for a board of size N
+    '''
+    if N in zobrist_keys_cache:
+        return zobrist_keys_cache[N]
+
+    rng = random.Random(N)
+    keys = {}
+    for piece in 'wWbB@$':
+        keys[piece] = [rng.getrandbits(64) for _ in range(N*N)]
+    keys['side'] = rng.getrandbits(64)
+    zobrist_keys_cache[N] = keys
+    return keys
+
+
+def zobrist_hash(bitboards, isWhiteTurn):
     '''
-    To calculate the evaluation function e(s), which will help decide how good a particular board is for one player
+    Compute the hash of the position from scratch
     '''
-    remaining_count = find_count(board_state)
+    keys = bitboards['zobrist']
+    hash_value = 0 if isWhiteTurn else keys['side']
+    for piece in 'wWbB@$':
+        for sq in iter_bits(bitboards[piece]):
+            hash_value ^= keys[piece][sq]
+    return hash_value
 
-    # Weights for pichus, pikachus and raichus respectively
-    x1 = 2
-    x2 = 4
-    x3 = 8
 
-    eval_value = x1*(len(remaining_count['w']) - len(remaining_count['b'])) \
-        + x2*(len(remaining_count['W']) - len(remaining_count['B'])) \
-        + x3*(len(remaining_count['@']) - len(remaining_count['$']))
+# Weights of the evaluation function for pichus, pikachus and raichus. The material term is
+# scaled by N so that a pichu is always worth more than all the rows it can still advance.
+PIECE_VALUES = {'w': 2, 'b': 2, 'W': 4, 'B': 4, '@': 8, '$': 8}
 
-    return eval_value
+# Weight for every row a pichu or pikachu has advanced towards its promotion row
+ADVANCEMENT_WEIGHT = 1
+
+evaluation_tables_cache = {}
+
+
+def evaluation_tables(N):
+    '''
+    Return the value of each piece on each square for a board of size N, positive for white
+    pieces and negative for black pieces. The evaluation of a board is the sum over its pieces,
+    which make_move and unmake_move keep up to date.
+    '''
+    if N in evaluation_tables_cache:
+        return evaluation_tables_cache[N]
+
+    tables = {}
+    for piece in 'wWbB@$':
+        table = []
+        for sq in range(N*N):
+            if piece in 'wW':
+                advanced = sq // N
+            elif piece in 'bB':
+                advanced = N-1 - sq // N
+            else:
+                advanced = 0
+            value = N*PIECE_VALUES[piece] + ADVANCEMENT_WEIGHT*advanced
+            table.append(value if piece in WHITE_PIECES else -value)
+        tables[piece] = table
+    evaluation_tables_cache[N] = tables
+    return tables
+
+
+def set_evaluation_weights(pichu, pikachu, raichu, advancement):
+    '''
+    Change the weights of the evaluation function (used to tune them by self-play). The cached
+    evaluation tables and the transposition table depend on the weights, so they are cleared.
+    Boards that were already converted with board_to_bitboards keep the score of the old weights.
+    '''
+    global ADVANCEMENT_WEIGHT, FUTILITY_MARGIN
+    PIECE_VALUES.update({'w': pichu, 'b': pichu, 'W': pikachu, 'B': pikachu, '@': raichu, '$': raichu})
+    ADVANCEMENT_WEIGHT = advancement
+    FUTILITY_MARGIN = 2*advancement
+    evaluation_tables_cache.clear()
+    tt_clear()
+
+
+def board_to_bitboards(board, N, isWhiteTurn=True):
+    '''
+    Convert a board in matrix format into the bitboard dict used by the search.
+    The dict also carries the sparse board of the occupied squares, the zobrist hash of the position
+    with isWhiteTurn as the side to move, the number of pieces of each side and the evaluation of the board.
+    '''
+    # Pieces already standing on their promotion row are evolved up front
+    check_raichu_evolution(board, N)
+
+    bitboards = {'N': N, 'w': 0, 'W': 0, 'b': 0, 'B': 0, '@': 0, '$': 0, 'squares': {}}
+    for i in range(N):
+        for j in range(N):
+            if board[i][j] in 'wWbB@$':
+                bitboards[board[i][j]] |= 1 << (i*N + j)
+                bitboards['squares'][i*N + j] = board[i][j]
+
+    bitboards['zobrist'] = zobrist_keys(N)
+    bitboards['hash'] = zobrist_hash(bitboards, isWhiteTurn)
+
+    # Piece counts of each side and the evaluation are kept up to date by make_move/unmake_move
+    tables = evaluation_tables(N)
+    bitboards['tables'] = tables
+    bitboards['white_count'] = 0
+    bitboards['black_count'] = 0
+    bitboards['score'] = 0
+    for piece in 'wWbB@$':
+        for sq in iter_bits(bitboards[piece]):
+            bitboards['white_count' if piece in WHITE_PIECES else 'black_count'] += 1
+            bitboards['score'] += tables[piece][sq]
+
+    return bitboards
+
+
+def bitboards_to_board(bitboards):
+    '''
+    Convert the bitboard dict back into the matrix format
+    '''
+    N = bitboards['N']
+    board = [['.'] * N for _ in range(N)]
+    for piece in 'wWbB@$':
+        for sq in iter_bits(bitboards[piece]):
+            board[sq // N][sq % N] = piece
+
+    return board
+
+
+# Moves are kept as compact tuples instead of full board copies:
+# (from_sq, to_sq, piece, captured_sq, captured_piece, promotion)
+# captured_sq/captured_piece are None for a normal move and promotion is True when a pichu or
+# pikachu reaches the last row and evolves to a raichu.
+
+def make_move(bitboards, move):
+    '''
+    Apply the move to the bitboards in place and update the hash (including the side to move),
+    the piece counts and the evaluation
+    '''
+    (from_sq, to_sq, piece, captured_sq, captured_piece, promotion) = move
+    keys = bitboards['zobrist']
+    tables = bitboards['tables']
+    squares = bitboards['squares']
+    bitboards[piece] ^= 1 << from_sq
+    del squares[from_sq]
+    hash_value = bitboards['hash'] ^ keys[piece][from_sq] ^ keys['side']
+    score = bitboards['score'] - tables[piece][from_sq]
+    if captured_sq is not None:
+        bitboards[captured_piece] ^= 1 << captured_sq
+        del squares[captured_sq]
+        hash_value ^= keys[captured_piece][captured_sq]
+        score -= tables[captured_piece][captured_sq]
+        bitboards['black_count' if piece in WHITE_PIECES else 'white_count'] -= 1
+    if promotion:
+        piece = '@' if piece in WHITE_PIECES else '$'
+    bitboards[piece] |= 1 << to_sq
+    squares[to_sq] = piece
+    bitboards['hash'] = hash_value ^ keys[piece][to_sq]
+    bitboards['score'] = score + tables[piece][to_sq]
+
+
+def unmake_move(bitboards, move):
+    '''
+    Take back a move that was applied with make_move
+    '''
+    (from_sq, to_sq, piece, captured_sq, captured_piece, promotion) = move
+    keys = bitboards['zobrist']
+    tables = bitboards['tables']
+    squares = bitboards['squares']
+    bitboards[piece] |= 1 << from_sq
+    del squares[to_sq]
+    squares[from_sq] = piece
+    hash_value = bitboards['hash'] ^ keys[piece][from_sq] ^ keys['side']
+    score = bitboards['score'] + tables[piece][from_sq]
+    if captured_sq is not None:
+        bitboards[captured_piece] |= 1 << captured_sq
+        squares[captured_sq] = captured_piece
+        hash_value ^= keys[captured_piece][captured_sq]
+        score += tables[captured_piece][captured_sq]
+        bitboards['black_count' if piece in WHITE_PIECES else 'white_count'] += 1
+    if promotion:
+        piece = '@' if piece in WHITE_PIECES else '$'
+    bitboards[piece] ^= 1 << to_sq
+    bitboards['hash'] = hash_value ^ keys[piece][to_sq]
+    bitboards['score'] = score - tables[piece][to_sq]
+
+
+def move_to_string(move, N):
+    '''
+    Return a readable form of the move, e.g. "w (1,2)->(3,4) x(2,3)"
+    '''
+    (from_sq, to_sq, piece, captured_sq, captured_piece, promotion) = move
+    move_string = '%s (%d,%d)->(%d,%d)' % (piece, from_sq // N, from_sq % N, to_sq // N, to_sq % N)
+    if captured_sq is not None:
+        move_string += ' x(%d,%d)' % (captured_sq // N, captured_sq % N)
+    if promotion:
+        move_string += ' =' + ('@' if piece in WHITE_PIECES else '$')
+    return move_string
+
+
+# Compact move notation: the column is a letter (a for column 0) and the row a number (1 for row 0, white's
+# side), and a move is its two squares with "-" between them, or "x" for a capture: "c3-d4", "b2xd4".
+# A promotion adds the new raichu: "c7-d8=@". The captured piece and square follow from the board.
+NOTATION_COLUMNS = 'abcdefghijklmnopqrstuvwxyzABCDEF'
+
+
+def square_name(sq, N):
+    return '%s%d' % (NOTATION_COLUMNS[sq % N], sq // N + 1)
+
+
+def move_notation(move, N):
+    '''
+    Return the compact notation of the move, e.g. "c3-d4" or "b2xd4"
+    '''
+    (from_sq, to_sq, piece, captured_sq, captured_piece, promotion) = move
+    notation = square_name(from_sq, N) + ('-' if captured_sq is None else 'x') + square_name(to_sq, N)
+    if promotion:
+        notation += '=' + ('@' if piece in WHITE_PIECES else '$')
+    return notation
+
+
+def parse_move_notation(board_state, isWhiteTurn, notation):
+    '''
+    Find the legal move of the side to move that the compact notation stands for
+    '''
+    for move in generate_moves(board_state, isWhiteTurn):
+        if move_notation(move, board_state['N']) == notation:
+            return move
+    raise Exception("Illegal move " + notation)
+
+
+def evaluation_function(board_state):
+    '''
+    To calculate the evaluation function e(s), which will help decide how good a particular board is for one player.
+    The value is the material of each side (pichu 2, pikachu 4, raichu 8, scaled by N) plus the rows advanced
+    by the pichus and pikachus, and is kept up to date by make_move/unmake_move so this is O(1).
+    '''
+    return board_state['score']
 
 
 def check_raichu_evolution(board, N):
-    '''	
-    Check for raichu formation for both white and black pieces	
+    '''
+    Check for raichu formation for both white and black pieces
     '''
     # Evolve to black raichu when pichu or pikachu reaches row 0
     for j in range(len(board[0])):
@@ -130,656 +427,1229 @@ def check_raichu_evolution(board, N):
 
 
 def check_game_end(board_state, isWhite):
-    '''	
-    Check if the game has ended	
     '''
-    count_map = find_count(board_state)
-    if (isWhite and (len(count_map['b']) == 0 and len(count_map['B']) == 0 and len(count_map['$']) == 0)):
+    Check if the game has ended
+    '''
+    if isWhite and board_state['black_count'] == 0:
         return True
 
-    if (not isWhite and (len(count_map['w']) == 0 and len(count_map['W']) == 0 and len(count_map['@']) == 0)):
+    if not isWhite and board_state['white_count'] == 0:
         return True
 
     return False
 
 
+def generate_moves(board_state, isWhiteTurn):
+    '''
+    Method to find all the moves for the side to move as move tuples
+    '''
+    moves = []
+    tables = move_tables(board_state['N'])
+    squares = board_state['squares']
+
+    if isWhiteTurn:
+        side = 'w'
+        pichu, pikachu, raichu = 'w', 'W', '@'
+        enemy_pichu, enemy_small, enemies = 'b', 'bB', BLACK_PIECES
+    else:
+        side = 'b'
+        pichu, pikachu, raichu = 'b', 'B', '$'
+        enemy_pichu, enemy_small, enemies = 'w', 'wW', WHITE_PIECES
+    promotion = tables['promotion'][side]
+
+    # Pichus move one square diagonally forward, or jump over an enemy pichu onto an empty square
+    pichu_table = tables['pichu'][side]
+    for sq in iter_bits(board_state[pichu]):
+        for (step, land) in pichu_table[sq]:
+            occupant = squares.get(step)
+            if occupant is None:
+                moves.append((sq, step, pichu, None, None, promotion[step]))
+            elif occupant == enemy_pichu and land is not None and land not in squares:
+                moves.append((sq, land, pichu, step, enemy_pichu, promotion[land]))
+
+    # Pikachus move one or two squares forward, left or right, or jump over an enemy pichu/pikachu
+    # that is one or two squares away onto the empty square right behind it
+    pikachu_table = tables['pikachu'][side]
+    for sq in iter_bits(board_state[pikachu]):
+        for path in pikachu_table[sq]:
+            for (k, to) in enumerate(path):
+                occupant = squares.get(to)
+                if occupant is None:
+                    if k < 2:
+                        moves.append((sq, to, pikachu, None, None, promotion[to]))
+                        continue
+                elif occupant in enemy_small and k < len(path)-1 and path[k+1] not in squares:
+                    land = path[k+1]
+                    moves.append((sq, land, pikachu, to, occupant, promotion[land]))
+                break
+
+    # Raichus slide any distance in all 8 directions. They can jump over a single enemy piece
+    # and land on any of the empty squares behind it.
+    raichu_table = tables['raichu']
+    for sq in iter_bits(board_state[raichu]):
+        for path in raichu_table[sq]:
+            captured_sq = None
+            captured_piece = None
+            for to in path:
+                occupant = squares.get(to)
+                if occupant is None:
+                    moves.append((sq, to, raichu, captured_sq, captured_piece, False))
+                elif occupant in enemies and captured_sq is None:
+                    captured_sq = to
+                    captured_piece = occupant
+                else:
+                    break
+
+    return moves
+
+
+def generate_captures(board_state, isWhiteTurn):
+    '''
+    Method to find only the capturing moves for the side to move. Used by the quiescence search,
+    so the quiet moves are never built there.
+    '''
+    captures = []
+    tables = move_tables(board_state['N'])
+    squares = board_state['squares']
+
+    if isWhiteTurn:
+        side = 'w'
+        pichu, pikachu, raichu = 'w', 'W', '@'
+        enemy_pichu, enemy_small, enemies = 'b', 'bB', BLACK_PIECES
+    else:
+        side = 'b'
+        pichu, pikachu, raichu = 'b', 'B', '$'
+        enemy_pichu, enemy_small, enemies = 'w', 'wW', WHITE_PIECES
+    promotion = tables['promotion'][side]
+
+    pichu_table = tables['pichu'][side]
+    for sq in iter_bits(board_state[pichu]):
+        for (step, land) in pichu_table[sq]:
+            if squares.get(step) == enemy_pichu and land is not None and land not in squares:
+                captures.append((sq, land, pichu, step, enemy_pichu, promotion[land]))
+
+    pikachu_table = tables['pikachu'][side]
+    for sq in iter_bits(board_state[pikachu]):
+        for path in pikachu_table[sq]:
+            for (k, to) in enumerate(path):
+                occupant = squares.get(to)
+                if occupant is None:
+                    if k < 2:
+                        continue
+                elif occupant in enemy_small and k < len(path)-1 and path[k+1] not in squares:
+                    land = path[k+1]
+                    captures.append((sq, land, pikachu, to, occupant, promotion[land]))
+                break
+
+    # A raichu slides over the empty squares up to the first piece on the ray. If that is an enemy,
+    # every empty square behind it is a landing square.
+    raichu_table = tables['raichu']
+    for sq in iter_bits(board_state[raichu]):
+        for path in raichu_table[sq]:
+            captured_sq = None
+            for to in path:
+                occupant = squares.get(to)
+                if occupant is None:
+                    if captured_sq is not None:
+                        captures.append((sq, to, raichu, captured_sq, captured_piece, False))
+                elif occupant in enemies and captured_sq is None:
+                    captured_sq = to
+                    captured_piece = occupant
+                else:
+                    break
+
+    return captures
+
+
 def successors(board_state, isWhiteTurn):
-    '''	
-    Method to find all the successors for a given board state	
+    '''
+    Method to find all the successors for a given board state
     '''
     successors = []
-    N = len(board_state)
-        
-    for (key_piece, occurrences) in find_count(board_state).items():
-
-        if isWhiteTurn:
-            # Calculate moves for white pichu
-            if key_piece == 'w' and len(occurrences):
-                for (i,j) in occurrences:
-                    # checking whether we can move diagonally forward left
-                    if is_valid_index(i+1, j-1, N):
-                        # checking if the white pichu can attack
-                        if board_state[i+1][j-1] == 'b' and is_valid_index(i+2, j-2, N) and board_state[i+2][j-2] == '.':
-                            successors.append(return_modified_board(board_state, (i,j), (i+2, j-2), isAttack = True, attackPos=(i+1,j-1)))
-
-                        # checking if the normal move is feasible
-                        elif board_state[i+1][j-1] == '.':
-                            successors.append(return_modified_board(board_state, (i,j), (i+1, j-1)))
-                                
-                    # checking diagnal right
-                    if is_valid_index(i+1, j+1, N):
-                        # checking if the white pichu can attack
-                        if board_state[i+1][j+1] == 'b' and is_valid_index(i+2, j+2, N) and board_state[i+2][j+2] == '.':
-                            successors.append(return_modified_board(board_state, (i,j), (i+2, j+2), isAttack = True, attackPos=(i+1,j+1)))
-        
-                        # checking if the normal move is feasible
-                        elif board_state[i+1][j+1] == '.':
-                            successors.append(return_modified_board(board_state, (i,j), (i+1, j+1)))
-
-            # Moves for white pikachu          
-            if key_piece == 'W' and len(occurrences):
-                for (i,j) in occurrences:
-                    # checking whether we can move straight
-                    for k in range(1,3):
-                        if not is_valid_index(i+k, j, N):
-                            break
-                        if board_state[i+k][j] not in 'bB.':
-                            break
-                            
-                        # checking if the white pikachu can attack
-                        if board_state[i+k][j] in 'bB' and is_valid_index(i+k+1, j, N) :
-                            if board_state[i+k+1][j] != '.':
-                                break
-                            successors.append(return_modified_board(board_state, (i,j), (i+k+1, j), isAttack = True, attackPos=(i+k,j)))
-                            break
-
-                        # checking if the normal move is feasible
-                        if board_state[i+k][j] == '.':
-                            successors.append(return_modified_board(board_state, (i,j), (i+k, j)))
-                            
-                    # checking left
-                    for k in range(1,3):
-                        if not is_valid_index(i, j-k, N):
-                            break
-                        if board_state[i][j-k] not in 'bB.':
-                            break
-                            
-                        # checking if the white pikachu can attack
-                        if board_state[i][j-k] in 'bB' and is_valid_index(i, j-k-1, N):
-                            if board_state[i][j-k-1] != '.':
-                                break
-                            successors.append(return_modified_board(board_state, (i,j), (i, j-k-1), isAttack = True, attackPos=(i,j-k)))
-                            break
-
-                        # checking if the normal move is feasible
-                        if board_state[i][j-k] == '.':
-                            successors.append(return_modified_board(board_state, (i,j), (i, j-k)))
-                            
-                    # checking right
-                    for k in range(1,3):
-                        if not is_valid_index(i, j+k, N):
-                            break
-                        if board_state[i][j+k] not in 'bB.':
-                            break
-                            
-                        # checking if the black pikachu can attack
-                        if board_state[i][j+k] in 'bB' and is_valid_index(i, j+k+1, N):
-                            if board_state[i][j+k+1] != '.':
-                                break
-                            successors.append(return_modified_board(board_state, (i,j), (i, j+k+1), isAttack = True, attackPos=(i,j+k)))
-                            break
-
-                        # checking if the normal move is feasible
-                        if board_state[i][j+k] == '.':
-                            successors.append(return_modified_board(board_state, (i,j), (i, j+k)))
-                            
-            # Raichu moves               
-            if key_piece == '@' and len(occurrences):
-                for (i,j) in occurrences:
-                    
-                    # moving forward
-                    skipNextIter = False
-                    temp_board = deepcopy(board_state)
-                    temp_i = i
-                    count = 0
-                    for k in range(i+1, N):
-                        if skipNextIter:
-                            skipNextIter = False
-                            continue
-                        if temp_board[k][j] not in 'bB$.':
-                            break
-                            
-                        if temp_board[k][j] == '.':
-                            successors.append(return_modified_board(temp_board, (temp_i,j), (k, j)))
-                            
-                        if temp_board[k][j] in 'bB$' and is_valid_index(k+1, j, N):
-                            if temp_board[k+1][j] != '.' or count == 1:
-                                break
-                            count += 1
-                            successors.append(return_modified_board(temp_board, (temp_i,j), (k+1, j), isAttack = True, attackPos=(k,j), returnCopy = False))
-                            skipNextIter = True
-                            temp_i = k+1
-                            
-                    # moving back
-                    skipNextIter = False
-                    temp_board = deepcopy(board_state)
-                    temp_i = i
-                    count = 0
-                    for k in range(i-1, -1, -1):
-                        if skipNextIter:
-                            skipNextIter = False
-                            continue
-                        if temp_board[k][j] not in 'bB$.':
-                            break
-                        
-                        if temp_board[k][j] == '.':
-                            successors.append(return_modified_board(temp_board, (temp_i,j), (k, j)))
-                            
-                        if temp_board[k][j] in 'bB$' and is_valid_index(k-1, j, N):
-                            if temp_board[k-1][j] != '.' or count==1:
-                                break
-                            count += 1
-                            successors.append(return_modified_board(temp_board, (temp_i,j), (k-1, j), isAttack = True, attackPos=(k,j), returnCopy = False))
-                            skipNextIter = True
-                            temp_i = k-1
-                            
-                            
-                    # moving left
-                    skipNextIter = False
-                    temp_board = deepcopy(board_state)
-                    temp_j = j
-                    count = 0
-                    for k in range(j-1, -1, -1):
-                        if skipNextIter:
-                            skipNextIter = False
-                            continue
-                        if temp_board[i][k] not in 'bB$.':
-                            break
-                            
-                        if temp_board[i][k] == '.':
-                            successors.append(return_modified_board(temp_board, (i,temp_j), (i, k)))
-                            
-                        if temp_board[i][k] in 'bB$' and is_valid_index(i, k-1, N):
-                            if temp_board[i][k-1] != '.' or count==1:
-                                break
-                            count += 1
-                            successors.append(return_modified_board(temp_board, (i,temp_j), (i, k-1), isAttack = True, attackPos=(i,k), returnCopy = False))
-                            skipNextIter = True
-                            temp_j = k-1
-                            
-                            
-                    # moving right
-                    skipNextIter = False
-                    temp_board = deepcopy(board_state)
-                    temp_j = j
-                    count = 0
-                    for k in range(j+1, N):
-                        if skipNextIter:
-                            skipNextIter = False
-                            continue
-                        if temp_board[i][k] not in 'bB$.':
-                            break
-                            
-                        if temp_board[i][k] == '.':
-                            successors.append(return_modified_board(temp_board, (i,temp_j), (i, k)))
-                            
-                        if temp_board[i][k] in 'bB$' and is_valid_index(i, k+1, N):
-                            if temp_board[i][k+1] != '.' or count==1:
-                                break
-                            count += 1
-                            successors.append(return_modified_board(temp_board, (i,temp_j), (i, k+1), isAttack = True, attackPos=(i,k), returnCopy = False))
-                            skipNextIter = True
-                            temp_j = k+1
-                            
-                    # Diagonal Moves
-        
-                    skipNextIter = False
-                    temp_board = deepcopy(board_state)
-                    temp_i = i
-                    temp_j = j
-                    count = 0
-                    for k in range(1, N):
-                        if not is_valid_index(i-k, j-k, N):
-                            break
-                        if skipNextIter:
-                            skipNextIter = False
-                            continue
-                        if temp_board[i-k][j-k] not in 'bB$.':
-                            break
-                            
-                        if temp_board[i-k][j-k] == '.':
-                            successors.append(return_modified_board(temp_board, (temp_i,temp_j), (i-k, j-k)))
-                            
-                        if temp_board[i-k][j-k] in 'bB$' and is_valid_index(i-k-1, j-k-1, N):
-                            if temp_board[i-k-1][j-k-1] != '.' or count == 1:
-                                break
-                            count += 1
-                            successors.append(return_modified_board(temp_board, (temp_i,temp_j), (i-k-1, j-k-1), isAttack = True, attackPos=(i-k,j-k), returnCopy = False))
-                            skipNextIter = True
-                            temp_i = i-k-1
-                            temp_j = j-k-1
-                            
-                    skipNextIter = False
-                    temp_board = deepcopy(board_state)
-                    temp_i = i
-                    temp_j = j
-                    count = 0
-                    for k in range(1, N):
-                        if not is_valid_index(i+k, j+k, N):
-                            break
-                        if skipNextIter:
-                            skipNextIter = False
-                            continue
-                        if temp_board[i+k][j+k] not in 'bB$.':
-                            break
-                            
-                        if temp_board[i+k][j+k] == '.':
-                            successors.append(return_modified_board(temp_board, (temp_i,temp_j), (i+k, j+k)))
-                            
-                        if temp_board[i+k][j+k] in 'bB$' and is_valid_index(i+k+1, j+k+1, N):
-                            if temp_board[i+k+1][j+k+1] != '.' or count == 1:
-                                break
-                            count += 1
-                            successors.append(return_modified_board(temp_board, (temp_i,temp_j), (i+k+1, j+k+1), isAttack = True, attackPos=(i+k,j+k), returnCopy = False))
-                            skipNextIter = True
-                            temp_i = i+k+1
-                            temp_j = j+k+1
-                            
-                    skipNextIter = False
-                    temp_board = deepcopy(board_state)
-                    temp_i = i
-                    temp_j = j
-                    count = 0
-                    for k in range(1, N):
-                        if not is_valid_index(i-k, j+k, N):
-                            break
-                        if skipNextIter:
-                            skipNextIter = False
-                            continue
-                        if temp_board[i-k][j+k] not in 'bB$.':
-                            break
-                            
-                        if temp_board[i-k][j+k] == '.':
-                            successors.append(return_modified_board(temp_board, (temp_i,temp_j), (i-k, j+k)))
-                            
-                        if temp_board[i-k][j+k] in 'bB$' and is_valid_index(i-k-1, j+k+1, N):
-                            if temp_board[i-k-1][j+k+1] != '.' or count == 1:
-                                break
-                            count += 1
-                            successors.append(return_modified_board(temp_board, (temp_i,temp_j), (i-k-1, j+k+1), isAttack = True, attackPos=(i-k,j+k), returnCopy = False))
-                            skipNextIter = True
-                            temp_i = i-k-1
-                            temp_j = j+k+1
-                            
-                    skipNextIter = False
-                    temp_board = deepcopy(board_state)
-                    temp_i = i
-                    temp_j = j
-                    count = 0
-                    for k in range(1, N):
-                        if not is_valid_index(i+k, j-k, N):
-                            break
-                        if skipNextIter:
-                            skipNextIter = False
-                            continue
-                        if temp_board[i+k][j-k] not in 'bB$.':
-                            break
-                            
-                        if temp_board[i+k][j-k] == '.':
-                            successors.append(return_modified_board(temp_board, (temp_i,temp_j), (i+k, j-k)))
-                            
-                        if temp_board[i+k][j-k] in 'bB$' and is_valid_index(i+k+1, j-k-1, N):
-                            if temp_board[i+k+1][j-k-1] != '.' or count == 1:
-                                break
-                            count += 1
-                            successors.append(return_modified_board(temp_board, (temp_i,temp_j), (i+k+1, j-k-1), isAttack = True, attackPos=(i+k,j-k), returnCopy = False))
-                            skipNextIter = True
-                            temp_i = i+k+1
-                            temp_j = j-k-1
-        else:
-            # Moves for black pichu          
-            if key_piece == 'b' and len(occurrences):
-                for (i,j) in occurrences:
-                    # checking whether we can move diagonally forward left
-                    if is_valid_index(i-1, j-1, N):
-                        # checking if the black pichu can attack
-                        if board_state[i-1][j-1] == 'w' and is_valid_index(i-2, j-2, N) and board_state[i-2][j-2] == '.':
-                            successors.append(return_modified_board(board_state, (i,j), (i-2, j-2), isAttack = True, attackPos=(i-1,j-1)))
-
-                        # checking if the normal move is feasible
-                        elif board_state[i-1][j-1] == '.':
-                            successors.append(return_modified_board(board_state, (i,j), (i-1, j-1)))
-                                
-                    # checking diagonal right
-                    if is_valid_index(i-1, j+1, N):
-                        # checking if the black pichu can attack
-                        if board_state[i-1][j+1] == 'w' and is_valid_index(i-2, j+2, N) and board_state[i-2][j+2] == '.':
-                            successors.append(return_modified_board(board_state, (i,j), (i-2, j+2), isAttack = True, attackPos=(i-1,j+1)))
-        
-                        # checking if the normal move is feasible
-                        elif board_state[i-1][j+1] == '.':
-                            successors.append(return_modified_board(board_state, (i,j), (i-1, j+1)))
-
-            # moves for black pikachu
-            if key_piece == 'B' and len(occurrences):
-                for (i,j) in occurrences:
-                    # checking whether we can move straight
-                    for k in range(1,3):
-                        if not is_valid_index(i-k, j, N):
-                            break
-                        if board_state[i-k][j] not in 'wW.':
-                            break
-                            
-                        # checking if the black pikachu can attack
-                        if board_state[i-k][j] in 'wW' and is_valid_index(i-k-1, j, N):
-                            if board_state[i-k-1][j] != '.':
-                                break
-                            successors.append(return_modified_board(board_state, (i,j), (i-k-1, j), isAttack = True, attackPos=(i-k,j)))
-                            break
-
-                        # checking if the normal move is feasible
-                        if board_state[i-k][j] == '.':
-                            successors.append(return_modified_board(board_state, (i,j), (i-k, j)))
-                            
-                    # checking left
-                    for k in range(1,3):
-                        if not is_valid_index(i, j-k, N):
-                            break
-                        if board_state[i][j-k] not in 'wW.':
-                            break
-                            
-                        # checking if the black pikachu can attack
-                        if board_state[i][j-k] in 'wW' and is_valid_index(i, j-k-1, N):
-                            if board_state[i][j-k-1] != '.':
-                                break
-                            successors.append(return_modified_board(board_state, (i,j), (i, j-k-1), isAttack = True, attackPos=(i,j-k)))
-                            break
-
-                        # checking if the normal move is feasible
-                        if board_state[i][j-k] == '.':
-                            successors.append(return_modified_board(board_state, (i,j), (i, j-k)))
-                            
-                    # checking right
-                    for k in range(1,3):
-                        if not is_valid_index(i, j+k, N):
-                            break
-                        if board_state[i][j+k] not in 'wW.':
-                            break
-                            
-                        # checking if the white pikachu can attack
-                        if board_state[i][j+k] in 'wW' and is_valid_index(i, j+k+1, N):
-                            if board_state[i][j+k+1] != '.':
-                                break
-                            successors.append(return_modified_board(board_state, (i,j), (i, j+k+1), isAttack = True, attackPos=(i,j+k)))
-                            break
-
-                        # checking if the normal move is feasible
-                        if board_state[i][j+k] == '.':
-                            successors.append(return_modified_board(board_state, (i,j), (i, j+k)))
-
-            # Raichu moves               
-            if key_piece == '$' and len(occurrences):
-                for (i,j) in occurrences:
-                
-                # moving forward
-                    skipNextIter = False
-                    temp_board = deepcopy(board_state)
-                    temp_i = i
-                    count = 0
-                    for k in range(i+1, N):
-                        if skipNextIter:
-                            skipNextIter = False
-                            continue
-                        if temp_board[k][j] not in 'wW@.':
-                            break
-                            
-                        if temp_board[k][j] == '.':
-                            successors.append(return_modified_board(temp_board, (temp_i,j), (k, j)))
-                            
-                        if temp_board[k][j] in 'wW@' and is_valid_index(k+1, j, N):
-                            if temp_board[k+1][j] != '.' or count == 1:
-                                break
-                            count += 1
-                            successors.append(return_modified_board(temp_board, (temp_i,j), (k+1, j), isAttack = True, attackPos=(k,j), returnCopy = False))
-                            skipNextIter = True
-                            temp_i = k+1
-                            
-                    # moving back
-                    skipNextIter = False
-                    temp_board = deepcopy(board_state)
-                    temp_i = i
-                    count = 0
-                    for k in range(i-1, -1, -1):
-                        if skipNextIter:
-                            skipNextIter = False
-                            continue
-                        if temp_board[k][j] not in 'wW@.':
-                            break
-                        
-                        if temp_board[k][j] == '.':
-                            successors.append(return_modified_board(temp_board, (temp_i,j), (k, j)))
-                            
-                        if temp_board[k][j] in 'wW@' and is_valid_index(k-1, j, N):
-                            if temp_board[k-1][j] != '.' or count == 1:
-                                break
-                            count += 1
-                            successors.append(return_modified_board(temp_board, (temp_i,j), (k-1, j), isAttack = True, attackPos=(k,j), returnCopy = False))
-                            skipNextIter = True
-                            temp_i = k-1
-                            
-                            
-                    # moving left
-                    skipNextIter = False
-                    temp_board = deepcopy(board_state)
-                    temp_j = j
-                    count = 0
-                    for k in range(j-1, -1, -1):
-                        if skipNextIter:
-                            skipNextIter = False
-                            continue
-                        if temp_board[i][k] not in 'wW@.':
-                            break
-                            
-                        if temp_board[i][k] == '.':
-                            successors.append(return_modified_board(temp_board, (i,temp_j), (i, k)))
-                            
-                        if temp_board[i][k] in 'wW@' and is_valid_index(i, k-1, N):
-                            if temp_board[i][k-1] != '.' or count==1:
-                                break
-                            count += 1
-                            successors.append(return_modified_board(temp_board, (i,temp_j), (i, k-1), isAttack = True, attackPos=(i,k), returnCopy = False))
-                            skipNextIter = True
-                            temp_j = k-1
-                            
-                            
-                    # moving right
-                    skipNextIter = False
-                    temp_board = deepcopy(board_state)
-                    temp_j = j
-                    count = 0
-                    for k in range(j+1, N):
-                        if skipNextIter:
-                            skipNextIter = False
-                            continue
-                        if temp_board[i][k] not in 'wW@.':
-                            break
-                            
-                        if temp_board[i][k] == '.':
-                            successors.append(return_modified_board(temp_board, (i,temp_j), (i, k)))
-                            
-                        if temp_board[i][k] in 'wW@' and is_valid_index(i, k+1, N):
-                            if temp_board[i][k+1] != '.' or count == 1:
-                                break
-                            count += 1
-                            successors.append(return_modified_board(temp_board, (i,temp_j), (i, k+1), isAttack = True, attackPos=(i,k), returnCopy = False))
-                            skipNextIter = True
-                            temp_j = k+1
-                            
-                    # Diagonal Moves TODO
-        
-                    skipNextIter = False
-                    temp_board = deepcopy(board_state)
-                    temp_i = i
-                    temp_j = j
-                    count = 0
-                    for k in range(1, N):
-                        if not is_valid_index(i-k, j-k, N):
-                            break
-                        if skipNextIter:
-                            skipNextIter = False
-                            continue
-                        if temp_board[i-k][j-k] not in 'wW@.':
-                            break
-                            
-                        if temp_board[i-k][j-k] == '.':
-                            successors.append(return_modified_board(temp_board, (temp_i,temp_j), (i-k, j-k)))
-                            
-                        if temp_board[i-k][j-k] in 'wW@' and is_valid_index(i-k-1, j-k-1, N):
-                            if temp_board[i-k-1][j-k-1] != '.' or count == 1:
-                                break
-                            count += 1
-                            successors.append(return_modified_board(temp_board, (temp_i,temp_j), (i-k-1, j-k-1), isAttack = True, attackPos=(i-k,j-k), returnCopy = False))
-                            skipNextIter = True
-                            temp_i = i-k-1
-                            temp_j = j-k-1
-                            
-                    skipNextIter = False
-                    temp_board = deepcopy(board_state)
-                    temp_i = i
-                    temp_j = j
-                    count = 0
-                    for k in range(1, N):
-                        if not is_valid_index(i+k, j+k, N):
-                            break
-                        if skipNextIter:
-                            skipNextIter = False
-                            continue
-                        if temp_board[i+k][j+k] not in 'wW@.':
-                            break
-                            
-                        if temp_board[i+k][j+k] == '.':
-                            successors.append(return_modified_board(temp_board, (temp_i,temp_j), (i+k, j+k)))
-                            
-                        if temp_board[i+k][j+k] in 'wW@' and is_valid_index(i+k+1, j+k+1, N):
-                            if temp_board[i+k+1][j+k+1] != '.' or count == 1:
-                                break
-                            count += 1
-                            successors.append(return_modified_board(temp_board, (temp_i,temp_j), (i+k+1, j+k+1), isAttack = True, attackPos=(i+k,j+k), returnCopy = False))
-                            skipNextIter = True
-                            temp_i = i+k+1
-                            temp_j = j+k+1
-                            
-                    skipNextIter = False
-                    temp_board = deepcopy(board_state)
-                    temp_i = i
-                    temp_j = j
-                    count = 0
-                    for k in range(1, N):
-                        if not is_valid_index(i-k, j+k, N):
-                            break
-                        if skipNextIter:
-                            skipNextIter = False
-                            continue
-                        if temp_board[i-k][j+k] not in 'wW@.':
-                            break
-                            
-                        if temp_board[i-k][j+k] == '.':
-                            successors.append(return_modified_board(temp_board, (temp_i,temp_j), (i-k, j+k)))
-                            
-                        if temp_board[i-k][j+k] in 'wW@' and is_valid_index(i-k-1, j+k+1, N):
-                            if temp_board[i-k-1][j+k+1] != '.' or count == 1:
-                                break
-                            count += 1
-                            successors.append(return_modified_board(temp_board, (temp_i,temp_j), (i-k-1, j+k+1), isAttack = True, attackPos=(i-k,j+k), returnCopy = False))
-                            skipNextIter = True
-                            temp_i = i-k-1
-                            temp_j = j+k+1
-                            
-                    skipNextIter = False
-                    temp_board = deepcopy(board_state)
-                    temp_i = i
-                    temp_j = j
-                    count = 0
-                    for k in range(1, N):
-                        if not is_valid_index(i+k, j-k, N):
-                            break
-                        if skipNextIter:
-                            skipNextIter = False
-                            continue
-                        if temp_board[i+k][j-k] not in 'wW@.':
-                            break
-                            
-                        if temp_board[i+k][j-k] == '.':
-                            successors.append(return_modified_board(temp_board, (temp_i,temp_j), (i+k, j-k)))
-                            
-                        if temp_board[i+k][j-k] in 'wW@' and is_valid_index(i+k+1, j-k-1, N):
-                            if temp_board[i+k+1][j-k-1] != '.' or count == 1:
-                                break
-                            count += 1
-                            successors.append(return_modified_board(temp_board, (temp_i,temp_j), (i+k+1, j-k-1), isAttack = True, attackPos=(i+k,j-k), returnCopy = False))
-                            skipNextIter = True
-                            temp_i = i+k+1
-                            temp_j = j-k-1
-                          
+    for move in generate_moves(board_state, isWhiteTurn):
+        make_move(board_state, move)
+        successors.append(dict(board_state, squares=board_state['squares'].copy()))
+        unmake_move(board_state, move)
+
     return successors
 
 
-def minimax(board, depth, isWhiteTurn, alpha=-2**10000, beta=2**1000):
+# Iterative deepening stops at this depth even if there is time left
+MAX_DEPTH = 64
+
+# Time kept back from the time limit so that the last completed result is always printed:
+# a fixed part for process startup/printing plus a share of the limit
+TIME_SAFETY_MARGIN = 0.25
+TIME_SAFETY_FRACTION = 0.05
+
+# The clock is only read once every this many nodes
+TIME_CHECK_INTERVAL = 1024
+
+
+class SearchTimeout(Exception):
+    '''
+    Raised inside minimax when the deadline of the current search has passed
+    '''
+    pass
+
+
+# State shared by the nodes of the current search. 'deadline' is the deadline of the running iteration and
+# 'search_deadline' the one of the whole search (infinite: until stopped), which a ponder hit of the engine
+# server sets while the search runs. 'stopped' is set by the engine server to end the search early (it is read
+# together with the clock), depth/value/pv describe the last completed iteration.
+search_info = {'nodes': 0, 'deadline': None, 'search_deadline': float('inf'), 'stopped': False, 'depth': 0, 'value': None,
+               'pv': []}
+
+
+def search_stopped():
+    '''
+    Whether the running search has to end: its deadline passed, the engine server stopped it, or (in a helper
+    of the parallel search) the main process has finished the iteration the helper works for
+    '''
+    return search_info['stopped'] or time.time() > search_info['deadline'] \
+        or (search_worker['iteration'] is not None and shared_table['words'][-1] != search_worker['iteration'])
+
+# Score of a won game. It is far above anything the evaluation function can return.
+WIN_VALUE = 1000000
+
+# Bounds of the full alpha-beta window
+INFINITY = 2*WIN_VALUE
+
+# Transposition table: every slot holds a depth-preferred entry and an always-replace entry.
+# An entry is (hash, depth, value, bound, best move, generation). The table is kept between the iterations
+# of find_best_move; the generation tells entries of an older search apart.
+TT_SIZE = 1 << 16
+TT_EXACT = 0
+TT_LOWER = 1
+TT_UPPER = 2
+
+transposition_table = {
+    'depth_slots': [None] * TT_SIZE,
+    'always_slots': [None] * TT_SIZE,
+    'generation': 0,
+    'probes': 0,
+    'hits': 0,
+    'cutoffs': 0,
+    'stores': 0,
+}
+
+
+def tt_new_search():
+    '''
+    Start a new search: entries from previous searches may now be replaced first
+    and the statistics are reset
+    '''
+    transposition_table['generation'] += 1
+    for stat in ('probes', 'hits', 'cutoffs', 'stores'):
+        transposition_table[stat] = 0
+
+
+def tt_clear():
+    '''
+    Remove all the entries from the transposition table
+    '''
+    transposition_table['depth_slots'] = [None] * TT_SIZE
+    transposition_table['always_slots'] = [None] * TT_SIZE
+    if shared_table['array'] is not None:
+        ctypes.memset(ctypes.addressof(shared_table['array']), 0, ctypes.sizeof(shared_table['array']))
+    tt_new_search()
+
+
+def tt_probe(hash_value):
+    '''
+    Return the entry stored for the position, or None
+    '''
+    transposition_table['probes'] += 1
+    index = hash_value & (TT_SIZE-1)
+    entry = transposition_table['depth_slots'][index]
+    if entry is None or entry[0] != hash_value:
+        entry = transposition_table['always_slots'][index]
+        if entry is None or entry[0] != hash_value:
+            return None
+
+    transposition_table['hits'] += 1
+    return entry
+
+
+def tt_store(hash_value, depth, value, bound, move):
     '''
-    This method will call minimax recursively in a depth-first fashion until 	
-    a) it reaches its max depth or b) it reaches a end solution. The evaluation values from 	
-    these states are propagated upwards keeping in check that each player will make the best possible move	
-    from the successors available.
+    Store a search result. The depth-preferred slot is only overwritten by an equal or deeper
+    search (or when its entry is from an older search), everything else goes to the always-replace slot.
     '''
-    if depth == 0 or check_game_end(board, isWhiteTurn):
-        return (evaluation_function(board), board)
+    transposition_table['stores'] += 1
+    index = hash_value & (TT_SIZE-1)
+    generation = transposition_table['generation']
+    entry = (hash_value, depth, value, bound, move, generation)
+    current = transposition_table['depth_slots'][index]
+    if current is None or current[0] == hash_value or depth >= current[1] or current[5] != generation:
+        transposition_table['depth_slots'][index] = entry
+    else:
+        transposition_table['always_slots'][index] = entry
+
+
+def tt_stats():
+    '''
+    Return the hit-rate statistics of the transposition table for the current search. The fill is the one of
+    the table in use: the shared table (with the entries of the helpers) during a parallel search.
+    '''
+    probes = transposition_table['probes']
+    if shared_table['words'] is not None:
+        # the data words of the entries, without the stop word; an empty entry is 0
+        used = sum(1 for data in shared_table['words'][1:4*TT_SIZE:2] if data)
+    else:
+        used = sum(1 for entry in transposition_table['depth_slots'] if entry is not None) \
+            + sum(1 for entry in transposition_table['always_slots'] if entry is not None)
+    return {
+        'probes': probes,
+        'hits': transposition_table['hits'],
+        'cutoffs': transposition_table['cutoffs'],
+        'stores': transposition_table['stores'],
+        'hit_rate': transposition_table['hits'] / probes if probes else 0.0,
+        'fill': used / (2*TT_SIZE),
+    }
+
+
+# Shared transposition table of the parallel search: one table in shared memory for all the processes, which
+# use_shared_table swaps in for tt_probe and tt_store. Every index has 4 words, the depth-preferred and the
+# always-replace entry, each as the entry packed into one 64 bit word (tt_pack) and the hash xor that word: an
+# entry that is read while another process writes it does not match the hash and is not used, so no locks are
+# needed. The best move is kept as its from and to square (order_moves finds the move with them), and the
+# generation modulo 256. The word after the table is the stop word of the parallel search.
+TT_NO_SQUARE = 2047
+TT_VALUE_OFFSET = 1 << 22
+
+# 'array' is the shared memory, 'words' the same memory as 64 bit words, 'local' the tt_probe and tt_store of the
+# table of this process while the shared one is in use
+shared_table = {'array': None, 'words': None, 'local': None}
+
+
+def new_shared_table():
+    return multiprocessing.RawArray('Q', 4*TT_SIZE + 1)
+
+
+def tt_pack(depth, value, bound, move, generation):
+    if move is None:
+        squares = TT_NO_SQUARE << 11 | TT_NO_SQUARE
+    else:
+        squares = move[0] << 11 | move[1]
+    return (((value + TT_VALUE_OFFSET) << 7 | depth) << 2 | bound) << 30 | (generation & 255) << 22 | squares
+
+
+def shared_tt_probe(hash_value):
+    '''
+    tt_probe on the shared table. The best move of the entry is a (from_sq, to_sq) pair.
+    '''
+    transposition_table['probes'] += 1
+    words = shared_table['words']
+    index = (hash_value & (TT_SIZE-1)) << 2
+    data = words[index+1]
+    if words[index] ^ data != hash_value:
+        data = words[index+3]
+        if words[index+2] ^ data != hash_value:
+            return None
+
+    transposition_table['hits'] += 1
+    from_sq = data >> 11 & TT_NO_SQUARE
+    move = None if from_sq == TT_NO_SQUARE else (from_sq, data & TT_NO_SQUARE)
+    return (hash_value, data >> 32 & 127, (data >> 39) - TT_VALUE_OFFSET, data >> 30 & 3, move, data >> 22 & 255)
+
+
+def shared_tt_store(hash_value, depth, value, bound, move):
+    '''
+    tt_store on the shared table, with the same replacement
+    '''
+    transposition_table['stores'] += 1
+    words = shared_table['words']
+    index = (hash_value & (TT_SIZE-1)) << 2
+    generation = transposition_table['generation'] & 255
+    data = tt_pack(depth, value, bound, move, generation)
+    current = words[index+1]
+    if words[index] ^ current == hash_value or depth >= current >> 32 & 127 or current >> 22 & 255 != generation:
+        words[index] = hash_value ^ data
+        words[index+1] = data
+    else:
+        words[index+2] = hash_value ^ data
+        words[index+3] = data
+
+
+def use_shared_table(array):
+    '''
+    Search with the shared transposition table in array (from new_shared_table) instead of the table of this process
+    '''
+    global tt_probe, tt_store
+    if shared_table['local'] is None:
+        shared_table['local'] = (tt_probe, tt_store)
+    shared_table['array'] = array
+    shared_table['words'] = memoryview(array).cast('B').cast('Q')
+    (tt_probe, tt_store) = (shared_tt_probe, shared_tt_store)
+
+
+def use_local_table():
+    '''
+    Go back to the transposition table of this process
+    '''
+    global tt_probe, tt_store
+    if shared_table['local'] is not None:
+        (tt_probe, tt_store) = shared_table['local']
+    shared_table['local'] = None
+    shared_table['array'] = None
+    shared_table['words'] = None
+
+
+# Move ordering: the hash move is tried first, then captures (most valuable victim first),
+# then the killer moves of the ply and finally the quiet moves by their history score.
+# The captured piece values are the weights of the evaluation function.
+KILLERS_PER_PLY = 2
+
+move_ordering = {
+    # killer_moves[ply] holds the last quiet moves that caused a beta cutoff at that ply
+    'killer_moves': [[None] * KILLERS_PER_PLY for _ in range(MAX_DEPTH+1)],
+    # history[(piece, from_sq, to_sq)] grows with depth*depth for every cutoff by that quiet move
+    'history': {},
+    # beta cutoffs, and how many of them came from the first move that was tried
+    'cutoffs': 0,
+    'first_move_cutoffs': 0,
+}
+
+
+def ordering_new_search():
+    '''
+    Reset the killer moves and statistics and age the history scores for a new search
+    '''
+    move_ordering['killer_moves'] = [[None] * KILLERS_PER_PLY for _ in range(MAX_DEPTH+1)]
+    history = move_ordering['history']
+    for key in list(history):
+        history[key] //= 2
+        if not history[key]:
+            del history[key]
+    move_ordering['cutoffs'] = 0
+    move_ordering['first_move_cutoffs'] = 0
+
+
+def order_moves(moves, hash_move, ply):
+    '''
+    Sort the moves so that the ones most likely to cause a cutoff are searched first
+    '''
+    killers = move_ordering['killer_moves'][ply]
+    history = move_ordering['history']
+    if hash_move is not None and len(hash_move) == 2:
+        # the squares of the move from the shared transposition table
+        hash_move = next((move for move in moves if move[0] == hash_move[0] and move[1] == hash_move[1]), None)
+
+    def move_score(move):
+        if move == hash_move:
+            return (4, 0)
+        if move[3] is not None:
+            # most valuable victim first, and then the least valuable attacker
+            return (3, 16*PIECE_VALUES[move[4]] - PIECE_VALUES[move[2]])
+        if move in killers:
+            return (2, KILLERS_PER_PLY - killers.index(move))
+        return (1, history.get((move[2], move[0], move[1]), 0))
+
+    moves.sort(key=move_score, reverse=True)
+    return moves
+
+
+def record_cutoff(move, depth, ply, move_number):
+    '''
+    Update the killer moves, history table and statistics after a beta cutoff
+    '''
+    move_ordering['cutoffs'] += 1
+    if move_number == 0:
+        move_ordering['first_move_cutoffs'] += 1
+
+    if move[3] is not None:
+        return
+    killers = move_ordering['killer_moves'][ply]
+    if move not in killers:
+        killers.pop()
+        killers.insert(0, move)
+    key = (move[2], move[0], move[1])
+    move_ordering['history'][key] = move_ordering['history'].get(key, 0) + depth*depth
+
+
+def ordering_stats():
+    '''
+    Return the cutoff statistics of the current search. A high first_move_cutoff_rate
+    means that the move ordering finds the refutation early.
+    '''
+    cutoffs = move_ordering['cutoffs']
+    return {
+        'cutoffs': cutoffs,
+        'first_move_cutoffs': move_ordering['first_move_cutoffs'],
+        'first_move_cutoff_rate': move_ordering['first_move_cutoffs'] / cutoffs if cutoffs else 0.0,
+    }
+
+
+def game_end_value(board):
+    '''
+    Value of a finished game: the side with pieces left has won
+    '''
+    if check_game_end(board, True):
+        return WIN_VALUE
+    return -WIN_VALUE
+
+
+# Quiescence search: at depth 0 only captures are searched further, until the position is quiet.
+# A capture is skipped (delta pruning) when even winning the captured piece plus this margin
+# (in the units of the evaluation, per unit of N) cannot bring the score up to alpha.
+QUIESCENCE_DELTA_MARGIN = 2
+
+
+def order_captures(captures):
+    '''
+    Most valuable victim first, and then the least valuable attacker
+    '''
+    captures.sort(key=lambda move: 16*PIECE_VALUES[move[4]] - PIECE_VALUES[move[2]], reverse=True)
+    return captures
+
+
+def quiescence(board, isWhiteTurn, alpha, beta):
+    '''
+    Search only the captures below the depth limit so that the evaluation is never taken in the middle
+    of an exchange. The side to move may also "stand pat" on the static evaluation instead of capturing.
+    Like negamax, the value is from the point of view of the side to move.
+    '''
+    search_info['nodes'] += 1
+    if search_info['nodes'] % TIME_CHECK_INTERVAL == 0 and search_info['deadline'] is not None \
+            and search_stopped():
+        raise SearchTimeout()
+
+    if check_game_end(board, True) or check_game_end(board, False):
+        return game_end_value(board) if isWhiteTurn else -game_end_value(board)
 
     if isWhiteTurn:
-        maxVal = -2*10000
-        maxBoard = None
-        for s in successors(board, True):
-            if check_game_end(s, False):
-                return (maxVal, s)
-            (value, new_board) = minimax(s, depth-1, False)
-            if not maxBoard:
-                maxBoard = s
-                maxVal = value
-            elif value > maxVal:
-                maxBoard = s
-                maxVal = value
-            alpha = max(alpha, value)
-            if beta <= alpha:
-                break
-        return (maxVal, maxBoard)
+        stand_pat = evaluation_function(board)
+        sign = 1
+        raichu = '@'
+    else:
+        stand_pat = -evaluation_function(board)
+        sign = -1
+        raichu = '$'
+    if stand_pat >= beta:
+        return stand_pat
+    alpha = max(alpha, stand_pat)
+    best = stand_pat
+
+    tables = board['tables']
+    delta_margin = QUIESCENCE_DELTA_MARGIN*board['N']
+    for move in order_captures(generate_captures(board, isWhiteTurn)):
+        (from_sq, to_sq, piece, captured_sq, captured_piece, promotion) = move
+        # gain of the capture: the captured piece, plus the step up to a raichu when promoting
+        gain = -tables[captured_piece][captured_sq]
+        if promotion:
+            gain += tables[raichu][to_sq] - tables[piece][from_sq]
+        if stand_pat + sign*gain + delta_margin <= alpha:
+            continue
+
+        make_move(board, move)
+        value = -quiescence(board, not isWhiteTurn, -beta, -alpha)
+        unmake_move(board, move)
+        if value > best:
+            best = value
+            if value > alpha:
+                alpha = value
+                if alpha >= beta:
+                    break
+
+    return best
+
+
+# Selective search. Each of these can be switched off, and bench_raichu.py selective compares them with the
+# full-width search. They only act on null window nodes, off the principal variation.
+# Null-move pruning: let the side to move pass and search NULL_MOVE_REDUCTION plies less; when that is
+# still at least beta, a real move will be too. Not used when the side to move has only pichus, where
+# having to move can be a disadvantage (zugzwang), nor twice in a row.
+NULL_MOVE_PRUNING = True
+NULL_MOVE_REDUCTION = 2
+NULL_MOVE_MIN_DEPTH = 3
+
+# Late-move reductions: quiet moves (no capture or promotion) from the LMR_MIN_MOVE-th move on are
+# searched one ply less, and searched again at full depth when they turn out better than alpha.
+LATE_MOVE_REDUCTIONS = True
+LMR_MIN_MOVE = 3
+LMR_MIN_DEPTH = 3
+
+# Futility pruning: one ply above the leaves, quiet moves are skipped when the evaluation plus
+# FUTILITY_MARGIN cannot reach alpha. A quiet move only gains its advancement: a pichu moves one row
+# forward and a pikachu at most 2, so the margin is 2 rows (set_evaluation_weights keeps it up to date).
+FUTILITY_PRUNING = True
+FUTILITY_MARGIN = 2*ADVANCEMENT_WEIGHT
+
+
+def negamax(board, depth, alpha, beta, isWhiteTurn, ply, pv, root_moves=None, allow_null=True):
+    '''
+    The search core. Negamax form of minimax: the value is always from the point of view of the side
+    to move, so the maximizer and minimizer share one code path (the child's value is negated).
+    Principal variation search: the first move is searched with the full (alpha, beta) window and the
+    others only with a null window to prove that they are not better; a move that does turn out better
+    is searched again with the full window.
+    The moves are applied to the one board in place and taken back again, so no board is copied.
+    Results are stored in the transposition table under the zobrist hash of the board and reused
+    when the same position is reached again through a different move order.
+    The moves are searched in the order given by order_moves; ply is the distance from the root.
+    pv is filled with the principal variation (the best line found) from this node.
+    root_moves restricts the search at this node to the given moves, in that order when order_moves finds
+    nothing better (the helpers of the parallel search start on different moves). allow_null is False right
+    after a null move.
+    Raises SearchTimeout when search_info['deadline'] has passed or the search was stopped.
+    '''
+    search_info['nodes'] += 1
+    if search_info['nodes'] % TIME_CHECK_INTERVAL == 0 and search_info['deadline'] is not None \
+            and search_stopped():
+        raise SearchTimeout()
+
+    if check_game_end(board, True) or check_game_end(board, False):
+        return game_end_value(board) if isWhiteTurn else -game_end_value(board)
+
+    if depth == 0:
+        return quiescence(board, isWhiteTurn, alpha, beta)
 
+    alpha_orig = alpha
+    hash_move = None
+    entry = tt_probe(board['hash'])
+    if entry is not None:
+        (hash_value, entry_depth, value, bound, hash_move, generation) = entry
+        # No cutoffs at the root, where the move itself is needed, nor on the principal variation
+        # (full window nodes), so that the whole principal variation is found
+        if ply > 0 and beta - alpha == 1 and entry_depth >= depth:
+            if bound == TT_LOWER:
+                alpha = max(alpha, value)
+            elif bound == TT_UPPER:
+                beta = min(beta, value)
+            if bound == TT_EXACT or beta <= alpha:
+                transposition_table['cutoffs'] += 1
+                return value
+
+    null_window = ply > 0 and beta - alpha == 1
+    if null_window and (NULL_MOVE_PRUNING or FUTILITY_PRUNING):
+        static_value = evaluation_function(board) if isWhiteTurn else -evaluation_function(board)
+
+    if NULL_MOVE_PRUNING and null_window and allow_null and depth >= NULL_MOVE_MIN_DEPTH and static_value >= beta \
+            and (board['W'] | board['@'] if isWhiteTurn else board['B'] | board['$']):
+        # Pass: only the side to move changes
+        board['hash'] ^= board['zobrist']['side']
+        value = -negamax(board, depth-1-NULL_MOVE_REDUCTION, -beta, -beta+1, not isWhiteTurn, ply+1, [],
+                         allow_null=False)
+        board['hash'] ^= board['zobrist']['side']
+        if value >= beta:
+            return value if value < WIN_VALUE else beta
+
+    futile = FUTILITY_PRUNING and null_window and depth == 1 \
+        and static_value + FUTILITY_MARGIN <= alpha
+    pruned = False
+
+    if root_moves is None:
+        moves = order_moves(generate_moves(board, isWhiteTurn), hash_move, ply)
     else:
-        minVal = 2*10000
-        minBoard = None
-        for s in successors(board, False):
-            if check_game_end(s, True):
-                return (minVal, s)
-            (value, new_board) = minimax(s, depth-1, True)
-            if not minBoard:
-                minBoard = s
-                minVal = value
-            elif value > minVal:
-                minBoard = s
-                minVal = value
-            beta = max(beta, value)
-            if beta <= alpha:
-                break
-        return (minVal, minBoard)
+        moves = order_moves(list(root_moves), hash_move, ply)
 
+    # A side that cannot move has lost
+    bestVal = -WIN_VALUE
+    bestMove = None
+    for (move_number, move) in enumerate(moves):
+        quiet = move[3] is None and not move[5]
+        if futile and quiet:
+            pruned = True
+            continue
 
-def find_best_move(board, N, player, timelimit):
-    board = string_to_board(board, N)
-    depth = 2
-    while depth:
-        output = minimax(board, depth, player == 'w')
-        depth -= 1
-        yield string_output(output[1], N)
-        if check_game_end(output[1], player=='w'):
-            return
+        child_pv = []
+        make_move(board, move)
+        if move_number == 0:
+            value = -negamax(board, depth-1, -beta, -alpha, not isWhiteTurn, ply+1, child_pv)
+        else:
+            reduction = 1 if LATE_MOVE_REDUCTIONS and quiet and move_number >= LMR_MIN_MOVE \
+                and depth >= LMR_MIN_DEPTH else 0
+            value = -negamax(board, depth-1-reduction, -alpha-1, -alpha, not isWhiteTurn, ply+1, child_pv)
+            if reduction and value > alpha:
+                value = -negamax(board, depth-1, -alpha-1, -alpha, not isWhiteTurn, ply+1, child_pv)
+            if alpha < value < beta:
+                value = -negamax(board, depth-1, -beta, -alpha, not isWhiteTurn, ply+1, child_pv)
+        unmake_move(board, move)
+
+        if bestMove is None or value > bestVal:
+            bestVal = value
+            bestMove = move
+            if value > alpha:
+                alpha = value
+                pv[:] = [move] + child_pv
+                if alpha >= beta:
+                    record_cutoff(move, depth, ply, move_number)
+                    break
+
+    # The skipped quiet moves could have reached (at most) the evaluation plus the margin
+    if pruned and (bestMove is None or bestVal < static_value + FUTILITY_MARGIN):
+        bestVal = static_value + FUTILITY_MARGIN
+
+    # The result of a restricted search is not the value of the position
+    if root_moves is None:
+        if bestVal <= alpha_orig:
+            bound = TT_UPPER
+        elif bestVal >= beta:
+            bound = TT_LOWER
+        else:
+            bound = TT_EXACT
+        tt_store(board['hash'], depth, bestVal, bound, bestMove)
+
+    return bestVal
+
+
+def minimax(board, depth, isWhiteTurn, alpha=-INFINITY, beta=INFINITY, root_moves=None):
+    '''
+    Search the board to the given depth. White is the maximizer and black the minimizer: alpha, beta and
+    the returned value are from white's point of view, while negamax works from the side to move.
+    Returns the value, the best move (None when there is nothing to play) and the principal variation.
+    '''
+    pv = []
+    if isWhiteTurn:
+        value = negamax(board, depth, alpha, beta, True, 0, pv, root_moves)
+    else:
+        value = -negamax(board, depth, -beta, -alpha, False, 0, pv, root_moves)
+
+    return (value, pv[0] if pv else None, pv)
+
+
+# Aspiration windows: from depth ASPIRATION_MIN_DEPTH on, every iteration starts with a window of
+# ASPIRATION_WINDOW*N around the value of the previous iteration. When the value falls outside,
+# that side of the window is widened (4 times each try) and the depth is searched again.
+ASPIRATION_WINDOW = 1
+ASPIRATION_MIN_DEPTH = 3
+
+
+def aspiration_search(board, depth, isWhiteTurn, previous_value=None, root_moves=None):
+    '''
+    Search the board to the given depth with an aspiration window around previous_value
+    '''
+    if previous_value is None or depth < ASPIRATION_MIN_DEPTH:
+        return minimax(board, depth, isWhiteTurn, root_moves=root_moves)
+
+    delta = ASPIRATION_WINDOW*board['N']
+    alpha = previous_value - delta
+    beta = previous_value + delta
+    while True:
+        (value, move, pv) = minimax(board, depth, isWhiteTurn, alpha, beta, root_moves)
+        if value <= alpha and alpha > -INFINITY:
+            delta *= 4
+            alpha = previous_value - delta if delta < WIN_VALUE else -INFINITY
+        elif value >= beta and beta < INFINITY:
+            delta *= 4
+            beta = previous_value + delta if delta < WIN_VALUE else INFINITY
+        else:
+            return (value, move, pv)
+
+# Search statistics. They are off by default and then cost nothing: enable_search_stats swaps the search
+# functions below for instrumented versions that count and time the calls, and disable_search_stats
+# puts the originals back. The counters are per iteration of find_best_move, which appends a summary of
+# every completed iteration to search_stats['iterations'] (and prints it on stderr if asked to), together
+# with the hit rate and fill of the transposition table (tt_stats) and the share of the cutoffs that came
+# from the first move (ordering_stats), both for the search so far.
+# Only the search in this process is counted, not the workers of the parallel search.
+# The times include the cost of reading the clock, which is large next to a call of check_game_end.
+INSTRUMENTED_FUNCTIONS = ('negamax', 'quiescence', 'generate_moves', 'generate_captures',
+                          'evaluation_function', 'check_game_end')
+
+SEARCH_STATS_COUNTERS = ('interior_nodes', 'leaf_nodes', 'quiescence_nodes', 'cutoffs', 'quiescence_cutoffs',
+                         'seldepth', 'movegen_time', 'evaluation_time', 'terminal_time')
+
+search_stats = {'enabled': False, 'print': False, 'iterations': [], 'ply': 0}
+search_stats.update((counter, 0) for counter in SEARCH_STATS_COUNTERS)
+
+# The original functions while the instrumented ones are in use
+uninstrumented = {}
+
+
+def instrumented_negamax(board, depth, alpha, beta, isWhiteTurn, ply, pv, root_moves=None, allow_null=True):
+    if depth > 0:
+        search_stats['interior_nodes'] += 1
+    else:
+        search_stats['leaf_nodes'] += 1
+        # quiescence continues from the ply of the leaf
+        search_stats['ply'] = ply
+    if ply > search_stats['seldepth']:
+        search_stats['seldepth'] = ply
+    value = uninstrumented['negamax'](board, depth, alpha, beta, isWhiteTurn, ply, pv, root_moves, allow_null)
+    if value >= beta and depth > 0:
+        search_stats['cutoffs'] += 1
+    return value
+
+
+def instrumented_quiescence(board, isWhiteTurn, alpha, beta):
+    search_stats['quiescence_nodes'] += 1
+    ply = search_stats['ply']
+    if ply > search_stats['seldepth']:
+        search_stats['seldepth'] = ply
+    search_stats['ply'] = ply + 1
+    try:
+        value = uninstrumented['quiescence'](board, isWhiteTurn, alpha, beta)
+    finally:
+        search_stats['ply'] = ply
+    if value >= beta:
+        search_stats['quiescence_cutoffs'] += 1
+    return value
+
+
+def instrumented_generate_moves(board_state, isWhiteTurn):
+    start = time.perf_counter()
+    moves = uninstrumented['generate_moves'](board_state, isWhiteTurn)
+    search_stats['movegen_time'] += time.perf_counter() - start
+    return moves
+
+
+def instrumented_generate_captures(board_state, isWhiteTurn):
+    start = time.perf_counter()
+    captures = uninstrumented['generate_captures'](board_state, isWhiteTurn)
+    search_stats['movegen_time'] += time.perf_counter() - start
+    return captures
+
+
+def instrumented_evaluation_function(board_state):
+    start = time.perf_counter()
+    value = uninstrumented['evaluation_function'](board_state)
+    search_stats['evaluation_time'] += time.perf_counter() - start
+    return value
+
+
+def instrumented_check_game_end(board_state, isWhite):
+    start = time.perf_counter()
+    game_over = uninstrumented['check_game_end'](board_state, isWhite)
+    search_stats['terminal_time'] += time.perf_counter() - start
+    return game_over
+
+
+def enable_search_stats(print_iterations=False):
+    '''
+    Start collecting search statistics, optionally printing every completed iteration on stderr
+    '''
+    module = globals()
+    if not search_stats['enabled']:
+        for name in INSTRUMENTED_FUNCTIONS:
+            uninstrumented[name] = module[name]
+            module[name] = module['instrumented_' + name]
+    search_stats['enabled'] = True
+    search_stats['print'] = print_iterations
+    search_stats['iterations'] = []
+    search_stats_new_iteration()
+
+
+def disable_search_stats():
+    '''
+    Stop collecting search statistics and put the original search functions back
+    '''
+    module = globals()
+    if search_stats['enabled']:
+        for name in INSTRUMENTED_FUNCTIONS:
+            module[name] = uninstrumented.pop(name)
+    search_stats['enabled'] = False
+
+
+def search_stats_new_iteration():
+    '''
+    Reset the counters at the start of an iteration
+    '''
+    for counter in SEARCH_STATS_COUNTERS:
+        search_stats[counter] = 0
+    search_stats['ply'] = 0
+
+
+def search_stats_iteration(depth, value, nodes, seconds):
+    '''
+    Summarize the counters of a completed iteration, append the summary to search_stats['iterations']
+    and return it. The effective branching factor is the growth in nodes over the previous iteration.
+    '''
+    iterations = search_stats['iterations']
+    iteration = {'depth': depth, 'value': value, 'nodes': nodes, 'time': seconds}
+    for counter in SEARCH_STATS_COUNTERS:
+        iteration[counter] = search_stats[counter]
+    previous = iterations[-1]['nodes'] if iterations else 0
+    iteration['ebf'] = nodes / previous if previous else None
+    table = tt_stats()
+    iteration['tt_hit_rate'] = table['hit_rate']
+    iteration['tt_fill'] = table['fill']
+    iteration['first_move_cutoff_rate'] = ordering_stats()['first_move_cutoff_rate']
+    iterations.append(iteration)
+
+    if search_stats['print']:
+        print('depth %d seldepth %d value %d nodes %d (interior %d, leaf %d, quiescence %d) cutoffs %d/%d ebf %s '
+              'time %.3fs (movegen %.3fs, eval %.3fs, terminal %.3fs) tt hits %.1f%% fill %.1f%% '
+              'first move cutoffs %.1f%%' % (
+                  depth, iteration['seldepth'], value, nodes, iteration['interior_nodes'], iteration['leaf_nodes'],
+                  iteration['quiescence_nodes'], iteration['cutoffs'], iteration['quiescence_cutoffs'],
+                  '-' if iteration['ebf'] is None else '%.2f' % iteration['ebf'], seconds,
+                  iteration['movegen_time'], iteration['evaluation_time'], iteration['terminal_time'],
+                  100*iteration['tt_hit_rate'], 100*iteration['tt_fill'], 100*iteration['first_move_cutoff_rate']),
+              file=sys.stderr, flush=True)
+    return iteration
+
+
+
+# Parallel search (with more than one worker): lazy SMP. While this process searches an iteration, the
+# SEARCH_WORKERS-1 worker processes search the same position as helpers, and all of them use one shared
+# transposition table: this process finds the values, bounds and best moves that the helpers stored for positions
+# it has not searched yet, and cuts its own search short with them. Every other helper searches one ply deeper,
+# and each one starts on the root moves in a different order, so that they go into different parts of the tree.
+# The result is the one of this process; the helpers are stopped as soon as it has finished the iteration.
+# The workers are started once, with their share of the settings and the table, and kept between iterations and
+# between searches, so they keep their move ordering too.
+SEARCH_WORKERS = 1
+PARALLEL_MIN_DEPTH = 3
+
+# A helper reads the clock and the stop word this often (in nodes), so that it stops soon after the iteration
+HELPER_CHECK_INTERVAL = 64
+
+# One single process pool per worker, so that every helper gets a task of its own. 'iteration' is the number of
+# the running iteration, which is in the stop word of the shared table while the helpers may work for it.
+parallel_search = {'pools': [], 'settings': None, 'table': None, 'search_id': 0, 'iteration': 0, 'futures': []}
+
+# State of a worker process: the board of the search it works for (search_id of the main process) and the
+# iteration it works for, None between tasks
+search_worker = {'search_id': None, 'board': None, 'iteration': None}
+
+
+def search_settings():
+    '''
+    The settings the worker processes must share with this process
+    '''
+    return {'piece_values': dict(PIECE_VALUES), 'advancement': ADVANCEMENT_WEIGHT, 'null_move': NULL_MOVE_PRUNING,
+            'late_move_reductions': LATE_MOVE_REDUCTIONS, 'futility': FUTILITY_PRUNING}
+
+
+def init_search_worker(settings, table):
+    '''
+    Initializer of a worker process: take over the settings of the main process and use the shared table
+    '''
+    global NULL_MOVE_PRUNING, LATE_MOVE_REDUCTIONS, FUTILITY_PRUNING, TIME_CHECK_INTERVAL
+    TIME_CHECK_INTERVAL = HELPER_CHECK_INTERVAL
+    # a forked worker starts with the state of the main process
+    use_local_table()
+    values = settings['piece_values']
+    set_evaluation_weights(values['w'], values['W'], values['@'], settings['advancement'])
+    NULL_MOVE_PRUNING = settings['null_move']
+    LATE_MOVE_REDUCTIONS = settings['late_move_reductions']
+    FUTILITY_PRUNING = settings['futility']
+    move_ordering['history'] = {}
+    ordering_new_search()
+    use_shared_table(table)
+
+
+def shutdown_search_workers(wait=True):
+    '''
+    Stop the worker processes. Before the interpreter exits they have to be waited for (wait True): an exit
+    while they are still shutting down can fail on the closed pipes of the pools.
+    '''
+    for pool in parallel_search['pools']:
+        pool.shutdown(wait=wait, cancel_futures=True)
+    parallel_search['pools'] = []
+
+
+def start_parallel_search(workers):
+    '''
+    Start a parallel search with this process and workers-1 helpers (started here unless they are already running
+    with the same settings), and switch this process to the shared table. use_local_table switches it back.
+    '''
+    settings = search_settings()
+    if len(parallel_search['pools']) != workers-1 or parallel_search['settings'] != settings:
+        shutdown_search_workers(wait=False)
+        parallel_search['table'] = new_shared_table()
+        parallel_search['pools'] = [ProcessPoolExecutor(1, initializer=init_search_worker,
+                                                        initargs=(settings, parallel_search['table']))
+                                    for _ in range(workers-1)]
+        parallel_search['settings'] = settings
+    use_shared_table(parallel_search['table'])
+    parallel_search['search_id'] += 1
+
+
+def helper_search(search_id, board_string, N, isWhiteTurn, moves, depth, generation, iteration, deadline):
+    '''
+    Worker task of the parallel search: search the position to depth, with the root moves in the given order,
+    until the main process stops the iteration or the deadline passes.
+    Returns the nodes searched and the processor seconds they took.
+    '''
+    start = time.process_time()
+    if search_worker['search_id'] != search_id:
+        search_worker['board'] = board_to_bitboards(string_to_board(board_string, N), N, isWhiteTurn)
+        search_worker['search_id'] = search_id
+        ordering_new_search()
+    transposition_table['generation'] = generation
+    search_worker['iteration'] = iteration
+    search_info['nodes'] = 0
+    search_info['deadline'] = float('inf') if deadline is None else deadline
+    try:
+        minimax(search_worker['board'], depth, isWhiteTurn, root_moves=moves)
+    except SearchTimeout:
+        # the board was left in the middle of the search
+        search_worker['search_id'] = None
+    search_worker['iteration'] = None
+
+    return (search_info['nodes'], time.process_time() - start)
+
+
+def start_helpers(board_string, N, isWhiteTurn, moves, depth, deadline=None):
+    '''
+    Let the helpers search the position while this process searches the iteration at depth. Helper k starts on the
+    root moves from the k+1-th on, and searches one ply deeper when k is odd.
+    '''
+    parallel_search['iteration'] += 1
+    shared_table['words'][-1] = parallel_search['iteration']
+    parallel_search['futures'] = [
+        pool.submit(helper_search, parallel_search['search_id'], board_string, N, isWhiteTurn,
+                    moves[(k+1) % len(moves):] + moves[:(k+1) % len(moves)], depth + k % 2,
+                    transposition_table['generation'], parallel_search['iteration'], deadline)
+        for (k, pool) in enumerate(parallel_search['pools'])]
+
+
+def stop_helpers():
+    '''
+    Stop the helpers of the iteration and wait for them. Their nodes are added to search_info['nodes'].
+    '''
+    parallel_search['iteration'] += 1
+    shared_table['words'][-1] = parallel_search['iteration']
+    for future in parallel_search['futures']:
+        (nodes, seconds) = future.result()
+        search_info['nodes'] += nodes
+    parallel_search['futures'] = []
+
+
+# Opening book and endgame tablebase. Both are built offline with build_tables.py and are only used when
+# their file is there; find_best_move plays a move from them without searching.
+# The book holds the move of a deep search for the positions near the start of the game, keyed by N and
+# the zobrist hash of the position (which includes the side to move). Every line of the book file is
+# "N hash from_sq to_sq value" with the value from white's point of view.
+BOOK_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'raichu_book.txt')
+
+# The tablebase holds the exact result of every position with at most TABLEBASE_MAX_PIECES pieces on
+# boards up to TABLEBASE_MAX_N, found by retrograde analysis. There is one table per board size and
+# material signature (the pieces on the board, e.g. 'wW$'), with one byte per position at the index
+# given by tablebase_index. The file is memory-mapped, so only the bytes that are looked at are read.
+TABLEBASE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'raichu_tablebase.bin')
+TABLEBASE_MAX_N = 6
+TABLEBASE_MAX_PIECES = 3
+
+# The file starts with TABLEBASE_MAGIC, the length of the JSON header (4 bytes, little endian) and the
+# header {"N:signature": offset}. A value byte is TB_DRAW, 1..127 for a win of the side to move in that many
+# plies, TB_LOSS+n for a loss in n plies, or TB_INVALID for an index that is not a position.
+TABLEBASE_MAGIC = b'RTB1'
+TB_DRAW = 0
+TB_LOSS = 128
+TB_INVALID = 255
+
+# The order of the pieces in a signature and in the index
+TABLEBASE_PIECES = 'wW@bB$'
+
+# Loaded on first use: False when the file is not there
+lookup_tables = {'book': None, 'tablebase': None}
+
+
+def load_book(filename=BOOK_FILE):
+    '''
+    Read an opening book file into a dict {(N, hash): (from_sq, to_sq, value)}
+    '''
+    book = {}
+    with open(filename, "r") as f:
+        for line in f:
+            parsed = line.split()
+            if parsed and not parsed[0].startswith('#'):
+                (N, hash_value, from_sq, to_sq, value) = [int(field) for field in parsed]
+                book[(N, hash_value)] = (from_sq, to_sq, value)
+    return book
+
+
+def book_move(board, isWhiteTurn):
+    '''
+    Return (move, value) from the opening book, or None when the position is not in the book
+    '''
+    if lookup_tables['book'] is None:
+        lookup_tables['book'] = load_book() if os.path.exists(BOOK_FILE) else False
+    if not lookup_tables['book']:
+        return None
+
+    entry = lookup_tables['book'].get((board['N'], board['hash']))
+    if entry is None:
+        return None
+    # The move is checked against the legal moves, so a hash collision cannot play a wrong move
+    for move in generate_moves(board, isWhiteTurn):
+        if (move[0], move[1]) == entry[:2]:
+            return (move, entry[2])
+    return None
+
+
+def tablebase_signature(board):
+    '''
+    The material signature of the board, e.g. 'wW$'
+    '''
+    return ''.join(piece * bin(board[piece]).count('1') for piece in TABLEBASE_PIECES)
+
+
+def tablebase_index(board, isWhiteTurn):
+    '''
+    Index of the position in the table of its signature: the squares of the pieces (in signature order,
+    ascending for pieces of the same kind) as digits of base N*N, then the side to move
+    '''
+    NN = board['N'] * board['N']
+    index = 0
+    for piece in TABLEBASE_PIECES:
+        for sq in iter_bits(board[piece]):
+            index = index*NN + sq
+    return 2*index + (0 if isWhiteTurn else 1)
+
+
+def load_tablebase(filename=TABLEBASE_FILE):
+    '''
+    Memory-map a tablebase file. Returns {'data': mmap, 'tables': {(N, signature): offset}}
+    '''
+    with open(filename, "rb") as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if data[:4] != TABLEBASE_MAGIC:
+        raise Exception("Not a tablebase file: " + filename)
+    header_length = int.from_bytes(data[4:8], 'little')
+    header = json.loads(data[8:8+header_length].decode())
+    tables = {}
+    for (key, offset) in header.items():
+        (N, signature) = key.split(':')
+        tables[(int(N), signature)] = 8 + header_length + offset
+    return {'data': data, 'tables': tables}
+
+
+def tablebase_probe(board, isWhiteTurn):
+    '''
+    Return the value byte of the position, or None when the tablebase does not cover it
+    '''
+    if lookup_tables['tablebase'] is None:
+        lookup_tables['tablebase'] = load_tablebase() if os.path.exists(TABLEBASE_FILE) else False
+    tablebase = lookup_tables['tablebase']
+    if not tablebase or board['N'] > TABLEBASE_MAX_N \
+            or board['white_count'] + board['black_count'] > TABLEBASE_MAX_PIECES:
+        return None
+
+    offset = tablebase['tables'].get((board['N'], tablebase_signature(board)))
+    if offset is None:
+        return None
+    return tablebase['data'][offset + tablebase_index(board, isWhiteTurn)]
+
+
+def tablebase_move(board, isWhiteTurn):
+    '''
+    Return (move, value) for the best move by the tablebase, or None when it does not cover the position.
+    The quickest win is preferred, then a draw, then the slowest loss. The value is from white's point of view.
+    '''
+    value = tablebase_probe(board, isWhiteTurn)
+    if value is None or value == TB_INVALID:
+        return None
+
+    best = None
+    for move in generate_moves(board, isWhiteTurn):
+        make_move(board, move)
+        if check_game_end(board, isWhiteTurn):
+            child = TB_LOSS
+        else:
+            child = tablebase_probe(board, not isWhiteTurn)
+        unmake_move(board, move)
+        # preference of the move for the side to move
+        if child >= TB_LOSS:
+            preference = (2, -(child - TB_LOSS))
+        elif child == TB_DRAW:
+            preference = (1, 0)
+        else:
+            preference = (0, child)
+        if best is None or preference > best[0]:
+            best = (preference, move)
+
+    if best is None:
+        return None
+    if value == TB_DRAW:
+        value = 0
+    elif value < TB_LOSS:
+        value = WIN_VALUE - value
+    else:
+        value = -(WIN_VALUE - (value - TB_LOSS))
+    return (best[1], value if isWhiteTurn else -value)
+
+
+def find_best_move(board, N, player, timelimit, workers=None, margin=TIME_SAFETY_MARGIN):
+    '''
+    Iterative deepening: search depth 1, 2, 3, ... and yield the best board of every completed
+    iteration until the time limit (minus a safety margin) runs out. An iteration that is still
+    running at the deadline is abandoned and the previous result stands. Without a time limit
+    (timelimit None) the search goes on until it is stopped or until search_info['search_deadline'],
+    which the caller sets up front (to infinity) and may change while the search runs.
+    With more than one worker (SEARCH_WORKERS by default) helper processes search alongside (lazy SMP).
+    A position in the opening book or the endgame tablebase is answered at once, without a search.
+    '''
+    start_time = time.time()
+    if timelimit is not None:
+        search_info['search_deadline'] = start_time + timelimit - margin - TIME_SAFETY_FRACTION*timelimit
+    search_info['depth'] = 0
+    if workers is None:
+        workers = SEARCH_WORKERS
+    board_string = board
+    board = board_to_bitboards(string_to_board(board, N), N, player == 'w')
+    tt_new_search()
+    ordering_new_search()
+
+    # The opening book and the endgame tablebase answer without a search
+    lookup = book_move(board, player == 'w')
+    if lookup is None:
+        lookup = tablebase_move(board, player == 'w')
+    if lookup is not None:
+        (move, value) = lookup
+        search_info['nodes'] = 0
+        search_info['depth'] = 0
+        search_info['value'] = value
+        search_info['pv'] = [move]
+        make_move(board, move)
+        yield string_output(bitboards_to_board(board), N)
+        return
+
+    if workers > 1:
+        root_moves = order_moves(generate_moves(board, player == 'w'), None, 0)
+        start_parallel_search(workers)
+
+    if search_stats['enabled']:
+        search_stats['iterations'] = []
+
+    value = None
+    try:
+        for depth in range(1, MAX_DEPTH+1):
+            # The first iteration always runs to completion so that there is a move to print
+            search_info['nodes'] = 0
+            # Under the ponder lock, so that a ponder hit cannot set the new deadline between this read and write
+            with engine_state['ponder_lock']:
+                search_info['deadline'] = search_info['search_deadline'] if depth > 1 else None
+            if search_stats['enabled']:
+                search_stats_new_iteration()
+                iteration_start = time.time()
+            helpers = workers > 1 and len(root_moves) > 1 and depth >= PARALLEL_MIN_DEPTH
+            if helpers:
+                start_helpers(board_string, N, player == 'w', root_moves, depth, search_info['deadline'])
+            try:
+                (value, move, pv) = aspiration_search(board, depth, player == 'w', value)
+            except SearchTimeout:
+                return
+            finally:
+                if helpers:
+                    stop_helpers()
+            if workers > 1 and move is not None:
+                # the helpers start from the best move so far
+                root_moves.remove(move)
+                root_moves.insert(0, move)
+            search_info['depth'] = depth
+            search_info['value'] = value
+            search_info['pv'] = pv
+            if search_stats['enabled']:
+                search_stats_iteration(depth, value, search_info['nodes'], time.time() - iteration_start)
+
+            if move is None:
+                # Nothing left to play, so the board stays as it is
+                yield string_output(bitboards_to_board(board), N)
+                return
+            make_move(board, move)
+            yield string_output(bitboards_to_board(board), N)
+            game_over = check_game_end(board, player=='w')
+            unmake_move(board, move)
+            if game_over or search_info['stopped'] or time.time() > search_info['search_deadline']:
+                return
+    finally:
+        if workers > 1:
+            use_local_table()
 
 
 def print_successors(successors):
@@ -787,21 +1657,241 @@ def print_successors(successors):
     for s in successors:
         print_board(s)
         print('------------------------>>>>')
-        
+
 def print_board(board):
+    if isinstance(board, dict):
+        board = bitboards_to_board(board)
+
     for i in range(len(board)):
         print(board[i])
 
     print(find_count(board))
 
 
+# Engine server: a long running process that reads one command per line on stdin and answers on stdout,
+# so that the move tables, the Zobrist keys and the transposition table stay warm from one move to the next.
+# The position command carries the whole game state, so one server can play any number of games.
+#
+#   position N player board   set the position for the next search
+#   go movetime ms            search the position for ms milliseconds. Every completed depth prints
+#                             "info depth d value v nodes n time ms pv moves" (value from white's point of view)
+#                             (moves in the compact notation of move_notation, e.g. "pv c3-d4 f6-e5")
+#                             and the end of the search prints "bestmove board"
+#                             "bestmove board ponder board" when pondering (the second board is the expected
+#                             reply of the opponent)
+#   stop                      end the running search now, its bestmove is printed as usual
+#   ponder on|off             ponder on the opponent's time (off by default)
+#   newgame                   clear the transposition table and the history scores
+#   isready                   answered with "readyok"
+#   quit                      stop the search and exit
+#
+# Bad commands are answered with "error message" and the server keeps running.
+# The search runs in a thread of the server process (not on a process pool) so that stop can reach it.
+#
+# Pondering: after its bestmove the search thread plays the expected reply (the second move of the
+# principal variation) and searches the position after it without a time limit, silently. When the next
+# go is for that position (a ponder hit), the running search is given its deadline and carries on as the
+# real search, keeping the depths it has already finished. Any other go (a miss) stops it and starts a
+# new search; the transposition table keeps what the ponder search found.
+
+# Time kept back from movetime. There is no process startup to pay for, only the pipe.
+SERVER_TIME_MARGIN = 0.02
+
+engine_state = {'position': None, 'thread': None, 'output': sys.stdout, 'lock': threading.Lock(),
+                'ponder': False, 'pondering': None, 'ponder_lock': threading.Lock()}
+
+
+def server_send(line):
+    '''
+    Write a line to the client. The search thread and the command loop both write, so the lock keeps lines whole.
+    '''
+    with engine_state['lock']:
+        engine_state['output'].write(line + '\n')
+        engine_state['output'].flush()
+
+
+def server_search(N, player, board, movetime):
+    '''
+    Body of the search thread: run find_best_move and report every completed depth and the final board,
+    then ponder on the expected reply if pondering is on. movetime None is a ponder search, which reports
+    nothing until a ponder hit turns it into the real search.
+    '''
+    while True:
+        start_time = time.time()
+        nodes = 0
+        best_board = board
+        pv = []
+        # the last info of a ponder search, printed after a ponder hit
+        silent_info = None
+        for new_board in find_best_move(board, N, player, None if movetime is None else movetime / 1000, 1,
+                                        SERVER_TIME_MARGIN):
+            best_board = new_board
+            pv = search_info['pv']
+            nodes += search_info['nodes']
+            info = 'info depth %d value %d nodes %d time %d pv %s' % (
+                search_info['depth'], search_info['value'], nodes, 1000*(time.time() - start_time),
+                ' '.join(move_notation(move, N) for move in pv))
+            if engine_state['pondering'] is None:
+                server_send(info)
+                silent_info = None
+            else:
+                silent_info = info
+
+        with engine_state['ponder_lock']:
+            if engine_state['pondering'] is not None:
+                # The ponder search ended without a hit: it was stopped or it ran out of depths
+                engine_state['pondering'] = None
+                return
+        if silent_info is not None:
+            server_send(silent_info)
+
+        ponder_board = server_ponder_board(N, player, best_board, pv)
+        if ponder_board is None or search_info['stopped']:
+            server_send('bestmove ' + best_board)
+            return
+
+        # The ponder search is set up before the client sees the bestmove, so that no go can come before it
+        with engine_state['ponder_lock']:
+            search_info['search_deadline'] = float('inf')
+            search_info['depth'] = 0
+            engine_state['pondering'] = (N, player, ponder_board)
+        server_send('bestmove %s ponder %s' % (best_board, ponder_board))
+        board = ponder_board
+        movetime = None
+
+
+def server_ponder_board(N, player, board, pv):
+    '''
+    The board after the expected reply of the opponent, or None when there is nothing to ponder on
+    '''
+    if not engine_state['ponder'] or len(pv) < 2:
+        return None
+    ponder_board = board_to_bitboards(string_to_board(board, N), N, player != 'w')
+    if pv[1] not in generate_moves(ponder_board, player != 'w'):
+        return None
+    make_move(ponder_board, pv[1])
+    if check_game_end(ponder_board, True) or check_game_end(ponder_board, False):
+        return None
+    return string_output(bitboards_to_board(ponder_board), N)
+
+
+def server_ponder_hit(position, movetime):
+    '''
+    Turn the ponder search into the real search when it is searching the position of the go command.
+    Returns False when it is not (a miss, or the ponder search already ended).
+    '''
+    with engine_state['ponder_lock']:
+        if engine_state['pondering'] != position:
+            return False
+        engine_state['pondering'] = None
+        timelimit = movetime / 1000
+        deadline = time.time() + timelimit - SERVER_TIME_MARGIN - TIME_SAFETY_FRACTION*timelimit
+        search_info['search_deadline'] = deadline
+        # The first depth is never interrupted, so that there is always a move
+        if search_info['depth'] >= 1:
+            search_info['deadline'] = deadline
+        return True
+
+
+def server_stop():
+    '''
+    Stop the running search (if any) and wait for it to print its bestmove.
+    A ponder search ends without printing anything.
+    '''
+    thread = engine_state['thread']
+    if thread is not None:
+        search_info['stopped'] = True
+        thread.join()
+        engine_state['thread'] = None
+
+
+def server_command(line):
+    '''
+    Run one command of the protocol. Returns False when the server should exit.
+    '''
+    words = line.split()
+    if not words:
+        return True
+    command = words[0]
+
+    if engine_state['thread'] is not None and not engine_state['thread'].is_alive():
+        engine_state['thread'].join()
+        engine_state['thread'] = None
+
+    if command == 'quit':
+        server_stop()
+        return False
+    elif command == 'stop':
+        server_stop()
+    elif command == 'isready':
+        server_send('readyok')
+    elif command == 'ponder':
+        if len(words) != 2 or words[1] not in ('on', 'off'):
+            server_send('error usage: ponder on|off')
+        else:
+            engine_state['ponder'] = words[1] == 'on'
+    elif command == 'newgame':
+        if engine_state['pondering'] is not None:
+            server_stop()
+        if engine_state['thread'] is not None:
+            server_send('error search running')
+        else:
+            tt_clear()
+            move_ordering['history'] = {}
+    elif command == 'position':
+        if len(words) != 4 or not words[1].isdigit():
+            server_send('error usage: position N player board')
+        elif words[2] not in ('w', 'b'):
+            server_send('error invalid player')
+        elif len(words[3]) != int(words[1])**2 or 0 in [c in "wb.WB@$" for c in words[3]]:
+            server_send('error bad board string')
+        else:
+            engine_state['position'] = (int(words[1]), words[2], words[3])
+    elif command == 'go':
+        if len(words) != 3 or words[1] != 'movetime' or not words[2].isdigit():
+            server_send('error usage: go movetime ms')
+        elif engine_state['position'] is None:
+            server_send('error no position')
+        elif engine_state['pondering'] is None and engine_state['thread'] is not None:
+            server_send('error search running')
+        elif not server_ponder_hit(engine_state['position'], int(words[2])):
+            # a ponder miss: the ponder search is thrown away
+            server_stop()
+            (N, player, board) = engine_state['position']
+            search_info['stopped'] = False
+            engine_state['thread'] = threading.Thread(target=server_search, args=(N, player, board, int(words[2])))
+            engine_state['thread'].start()
+    else:
+        server_send('error unknown command ' + command)
+    return True
+
+
+def engine_server(input_stream=sys.stdin, output_stream=sys.stdout):
+    '''
+    Read and run commands until quit or the end of the input
+    '''
+    engine_state['output'] = output_stream
+    while True:
+        line = input_stream.readline()
+        if not line:
+            server_stop()
+            return
+        if not server_command(line):
+            return
+
+
 if __name__ == "__main__":
-    if len(sys.argv) != 5:
-        raise Exception("Usage: Raichu.py N player board timelimit")
+    if len(sys.argv) == 2 and sys.argv[1] == 'server':
+        engine_server()
+        sys.exit(0)
+
+    if len(sys.argv) not in (5, 6):
+        raise Exception("Usage: Raichu.py N player board timelimit [workers] | Raichu.py server")
 
-    (_, N, player, board, timelimit) = sys.argv
+    (N, player, board, timelimit) = sys.argv[1:5]
     N = int(N)
     timelimit = int(timelimit)
+    workers = int(sys.argv[5]) if len(sys.argv) == 6 else SEARCH_WORKERS
     if player not in "wb":
         raise Exception("Invalid player.")
 
@@ -811,6 +1901,8 @@ if __name__ == "__main__":
     print("Searching for best move for " + player +
           " from board state: \n" + board_to_string(board, N))
     print("Here's what I decided:")
-    find_best_move(board, N, player, timelimit)
-    for new_board in find_best_move(board, N, player, timelimit):
-        print(new_board)
\ No newline at end of file
+    try:
+        for new_board in find_best_move(board, N, player, timelimit, workers):
+            print(new_board, flush=True)
+    finally:
+        shutdown_search_workers()
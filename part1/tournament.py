@@ -0,0 +1,358 @@
+#
+# tournament.py : Self-play tournaments for tuning the weights of the Raichu evaluation function
+#
+# Usage: python3 tournament.py [options] results_file
+#
+# Every engine is a set of evaluation weights, given as --engine name=pichu,pikachu,raichu,advancement
+# (the default is one engine with the weights of raichu.py, playing itself). Every pair of engines
+# plays every opening at every board size and time control, once with each colour. The games are
+# played in parallel on a process pool; each worker keeps its raichu tables between games.
+#
+# The results file gets one JSON line per game as soon as it finishes (PGN-like tags and movetext,
+# nodes and search time per side) and a summary line at the end (scores, Elo estimates, nodes/sec).
+# With --record, every game is also appended to a binary game record file (see game_record.py) with the
+# value, depth and nodes of every move.
+#
+import os
+import time
+import json
+import math
+import random
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import raichu
+import game_record
+
+# A game that is still running after this many plies is a draw
+MAX_PLIES = 300
+
+# Weights that are currently loaded into raichu in this (worker) process
+loaded_weights = {'weights': None}
+
+
+def use_weights(weights):
+    '''
+    Load the weights of an engine into raichu. This clears the transposition table,
+    so it is only done when the weights really change.
+    '''
+    if loaded_weights['weights'] != weights:
+        raichu.set_evaluation_weights(*weights)
+        loaded_weights['weights'] = weights
+
+
+def search_move(board, isWhiteTurn, movetime):
+    '''
+    Iterative deepening for movetime seconds, the same way find_best_move does it but without the
+    margin for process startup. Returns (move, value, depth, nodes) for the last completed depth,
+    counting the nodes of an abandoned iteration too.
+    '''
+    raichu.tt_new_search()
+    raichu.ordering_new_search()
+    raichu.search_info['stopped'] = False
+    deadline = time.time() + movetime
+    nodes = 0
+    value = None
+    move = None
+    completed = 0
+    for depth in range(1, raichu.MAX_DEPTH+1):
+        # The first iteration always runs to completion so that there is a move to play
+        raichu.search_info['nodes'] = 0
+        raichu.search_info['deadline'] = deadline if depth > 1 else None
+        try:
+            (value, move, pv) = raichu.aspiration_search(board, depth, isWhiteTurn, value)
+        except raichu.SearchTimeout:
+            nodes += raichu.search_info['nodes']
+            break
+        nodes += raichu.search_info['nodes']
+        completed = depth
+        if move is None or time.time() > deadline:
+            break
+    return (move, value, completed, nodes)
+
+
+def play_game(task):
+    '''
+    Play one game of the tournament in this process and return its record
+    '''
+    N = task['N']
+    isWhiteTurn = task['player'] == 'w'
+    board = raichu.board_to_bitboards(raichu.string_to_board(task['opening'], N), N, isWhiteTurn)
+    moves = []
+    # (move, value, depth, nodes) of every ply for the game record
+    searches = []
+    nodes = {'w': 0, 'b': 0}
+    search_time = {'w': 0.0, 'b': 0.0}
+
+    if raichu.check_game_end(board, True):
+        result = ('1-0', 'no black pieces')
+    elif raichu.check_game_end(board, False):
+        result = ('0-1', 'no white pieces')
+    else:
+        result = None
+
+    while result is None:
+        if len(moves) >= task['max_plies']:
+            result = ('1/2-1/2', 'max plies')
+            break
+
+        side = 'w' if isWhiteTurn else 'b'
+        use_weights(task['white'][1] if isWhiteTurn else task['black'][1])
+        # The search gets its own copy, scored with the weights of the engine to move. An abandoned
+        # iteration leaves its board in the middle of the search tree.
+        search_board = raichu.board_to_bitboards(raichu.bitboards_to_board(board), N, isWhiteTurn)
+
+        start_time = time.time()
+        (move, value, depth, move_nodes) = search_move(search_board, isWhiteTurn, task['movetime'])
+        search_time[side] += time.time() - start_time
+        nodes[side] += move_nodes
+
+        if move is None:
+            # A side that cannot move loses, as in the search and the tablebase
+            result = ('0-1', 'no moves') if isWhiteTurn else ('1-0', 'no moves')
+            break
+
+        raichu.make_move(board, move)
+        moves.append(raichu.move_notation(move, N))
+        searches.append((move, value, depth, move_nodes))
+        if raichu.check_game_end(board, isWhiteTurn):
+            result = ('1-0', 'no black pieces') if isWhiteTurn else ('0-1', 'no white pieces')
+        isWhiteTurn = not isWhiteTurn
+
+    return {
+        'game': task['game'],
+        'N': N,
+        'white': task['white'][0],
+        'black': task['black'][0],
+        'movetime': task['movetime'],
+        'opening': task['opening'],
+        'player': task['player'],
+        'result': result[0],
+        'reason': result[1],
+        'plies': len(moves),
+        'moves': movetext(moves, task['player']),
+        'nodes': nodes,
+        'search_time': {side: round(seconds, 3) for (side, seconds) in search_time.items()},
+        'searches': searches,
+    }
+
+
+def movetext(moves, player):
+    '''
+    PGN-like movetext: "1. a2-b3 b7-a6 2. ..." ("1... b7-a6" when black moves first)
+    '''
+    text = []
+    offset = 0 if player == 'w' else 1
+    for (ply, move) in enumerate(moves, offset):
+        if ply % 2 == 0:
+            text.append('%d.' % (ply // 2 + 1))
+        elif ply == offset:
+            text.append('%d...' % (ply // 2 + 1))
+        text.append(move)
+    return ' '.join(text)
+
+
+def random_opening(N, plies, rng):
+    '''
+    Play random moves from the starting position to get a different opening. Returns (player, board).
+    '''
+    while True:
+        isWhiteTurn = True
+        board = raichu.board_to_bitboards(raichu.string_to_board(raichu.initial_board_string(N), N), N, True)
+        for _ in range(plies):
+            moves = raichu.generate_moves(board, isWhiteTurn)
+            if not moves:
+                break
+            raichu.make_move(board, rng.choice(moves))
+            isWhiteTurn = not isWhiteTurn
+        else:
+            if not raichu.check_game_end(board, True) and not raichu.check_game_end(board, False):
+                return ('w' if isWhiteTurn else 'b', raichu.string_output(raichu.bitboards_to_board(board), N))
+
+
+def load_openings(filename):
+    '''
+    Read openings from a file with one "N player board" per line
+    '''
+    openings = []
+    with open(filename, "r") as f:
+        for line in f:
+            parsed = line.split()
+            if not parsed:
+                continue
+            (N, player, board) = parsed
+            if player not in ('w', 'b') or len(board) != int(N)**2 or 0 in [c in "wb.WB@$" for c in board]:
+                raise Exception("Bad opening: " + line.strip())
+            openings.append((int(N), player, board))
+    return openings
+
+
+def parse_engine(text):
+    '''
+    Parse "name=pichu,pikachu,raichu,advancement" into (name, weights)
+    '''
+    (name, _, weights) = text.partition('=')
+    weights = tuple(int(weight) for weight in weights.split(','))
+    if not name or len(weights) != 4:
+        raise Exception("Engines are given as name=pichu,pikachu,raichu,advancement")
+    return (name, weights)
+
+
+# The 95% margin of an Elo estimate is only given from this many games on, and not when all the games of the
+# pair had the same score (a sample variance of 0 says nothing about the spread of the results)
+ELO_MARGIN_MIN_GAMES = 10
+
+
+def elo_difference(score):
+    '''
+    Elo difference that gives the expected score (a fraction between 0 and 1)
+    '''
+    return 400 * math.log10(score / (1 - score))
+
+
+def summarize(records, engines):
+    '''
+    Scores, Elo estimates (with a 95% margin) and nodes/sec from the game records
+    '''
+    engine_stats = {name: {'games': 0, 'score': 0.0, 'nodes': 0, 'search_time': 0.0} for (name, _) in engines}
+    pair_results = {}
+    for record in records:
+        white_score = {'1-0': 1.0, '0-1': 0.0, '1/2-1/2': 0.5}[record['result']]
+        for (side, name, score) in (('w', record['white'], white_score), ('b', record['black'], 1 - white_score)):
+            engine_stats[name]['games'] += 1
+            engine_stats[name]['score'] += score
+            engine_stats[name]['nodes'] += record['nodes'][side]
+            engine_stats[name]['search_time'] += record['search_time'][side]
+        (first, second) = sorted((record['white'], record['black']))
+        pair_results.setdefault((first, second), []).append(white_score if record['white'] == first else 1 - white_score)
+
+    for stats in engine_stats.values():
+        stats['nps'] = int(stats['nodes'] / stats['search_time']) if stats['search_time'] else 0
+        stats['search_time'] = round(stats['search_time'], 3)
+
+    pairs = []
+    for ((first, second), scores) in sorted(pair_results.items()):
+        games = len(scores)
+        mean = sum(scores) / games
+        variance = sum((score - mean)**2 for score in scores) / games
+        margin = 1.96 * math.sqrt(variance / games)
+        pairs.append({
+            'engines': [first, second],
+            'games': games,
+            'score': sum(scores),
+            'elo': round(elo_difference(mean), 1) if 0 < mean < 1 else None,
+            'elo_margin': round((elo_difference(mean + margin) - elo_difference(mean - margin)) / 2, 1)
+            if games >= ELO_MARGIN_MIN_GAMES and variance > 0 and 0 < mean - margin and mean + margin < 1 else None,
+        })
+
+    return {'games': len(records), 'engines': engine_stats, 'pairs': pairs}
+
+
+def make_tasks(engines, openings, times, rounds, max_plies):
+    '''
+    Every pair of engines plays every opening at every time control, once with each colour
+    '''
+    if len(engines) == 1:
+        pairs = [(engines[0], engines[0])]
+    else:
+        pairs = [(engines[i], engines[j]) for i in range(len(engines)) for j in range(i+1, len(engines))]
+
+    tasks = []
+    for _ in range(rounds):
+        for (N, player, board) in openings:
+            for movetime in times:
+                for (first, second) in pairs:
+                    for (white, black) in ((first, second), (second, first)):
+                        tasks.append({'game': len(tasks)+1, 'N': N, 'player': player, 'opening': board,
+                                      'movetime': movetime, 'white': white, 'black': black, 'max_plies': max_plies})
+    return tasks
+
+
+def write_game_record(f, record):
+    '''
+    Append a finished game to the binary game record file
+    '''
+    tags = {key: record[key] for key in ('game', 'white', 'black', 'movetime', 'reason')}
+    game_record.append_game(f, game_record.encode_game(record['N'], record['player'], record['opening'],
+                                                       record['result'], record['searches'], tags))
+
+
+def run_tournament(tasks, engines, workers, results_file, record_file=None):
+    records = []
+    standings = {}
+    with open(results_file, "w") as out, ProcessPoolExecutor(workers) as pool:
+        record_out = open(record_file, "ab") if record_file else None
+        futures = [pool.submit(play_game, task) for task in tasks]
+        for future in as_completed(futures):
+            record = future.result()
+            if record_out is not None:
+                write_game_record(record_out, record)
+            del record['searches']
+            records.append(record)
+            out.write(json.dumps(record, separators=(',', ':')) + '\n')
+            out.flush()
+
+            white_score = {'1-0': 1.0, '0-1': 0.0, '1/2-1/2': 0.5}[record['result']]
+            standings[record['white']] = standings.get(record['white'], 0) + white_score
+            standings[record['black']] = standings.get(record['black'], 0) + 1 - white_score
+            nodes = record['nodes']['w'] + record['nodes']['b']
+            seconds = record['search_time']['w'] + record['search_time']['b']
+            print('[%*d/%d] game %d %dx%d %.2fs %s vs %s: %s (%s, %d plies, %d nodes/s)  %s' % (
+                len(str(len(tasks))), len(records), len(tasks), record['game'], record['N'], record['N'],
+                record['movetime'], record['white'], record['black'], record['result'], record['reason'],
+                record['plies'], nodes / seconds if seconds else 0,
+                ' '.join('%s %g' % (name, standings.get(name, 0)) for (name, _) in engines)), flush=True)
+
+        if record_out is not None:
+            record_out.close()
+        summary = summarize(sorted(records, key=lambda record: record['game']), engines)
+        out.write(json.dumps({'summary': summary}, separators=(',', ':')) + '\n')
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Self-play tournament for the Raichu evaluation weights')
+    parser.add_argument('results_file')
+    parser.add_argument('--engine', action='append', default=[],
+                        help='name=pichu,pikachu,raichu,advancement (repeat for more engines)')
+    parser.add_argument('--sizes', default='8', help='board sizes, e.g. 8,10')
+    parser.add_argument('--times', default='0.1', help='seconds per move, e.g. 0.1,0.5')
+    parser.add_argument('--openings', help='file with one "N player board" per line instead of the start positions')
+    parser.add_argument('--random-openings', type=int, default=0,
+                        help='number of random openings per board size (0 for the start position)')
+    parser.add_argument('--random-plies', type=int, default=4, help='random moves played for a random opening')
+    parser.add_argument('--rounds', type=int, default=1)
+    parser.add_argument('--max-plies', type=int, default=MAX_PLIES)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--record', help='binary game record file to append every game to (see game_record.py)')
+    args = parser.parse_args()
+
+    engines = [parse_engine(text) for text in args.engine]
+    if not engines:
+        engines = [('default', (raichu.PIECE_VALUES['w'], raichu.PIECE_VALUES['W'], raichu.PIECE_VALUES['@'],
+                                raichu.ADVANCEMENT_WEIGHT))]
+    if len(set(name for (name, _) in engines)) != len(engines):
+        raise Exception("Engine names should be unique")
+
+    if args.openings:
+        openings = load_openings(args.openings)
+    else:
+        rng = random.Random(args.seed)
+        openings = []
+        for N in [int(size) for size in args.sizes.split(',')]:
+            if args.random_openings:
+                openings.extend((N,) + random_opening(N, args.random_plies, rng) for _ in range(args.random_openings))
+            else:
+                openings.append((N, 'w', raichu.initial_board_string(N)))
+
+    tasks = make_tasks(engines, openings, [float(t) for t in args.times.split(',')], args.rounds, args.max_plies)
+    print('%d games on %d workers' % (len(tasks), args.workers), flush=True)
+    summary = run_tournament(tasks, engines, args.workers, args.results_file, args.record)
+
+    for (name, stats) in summary['engines'].items():
+        print('%-12s %5d games %7.1f points %10d nodes/s' % (name, stats['games'], stats['score'], stats['nps']))
+    for pair in summary['pairs']:
+        print('%s vs %s: %g/%d  Elo %s' % (pair['engines'][0], pair['engines'][1], pair['score'], pair['games'],
+                                           'n/a' if pair['elo'] is None else '%+.1f' % pair['elo'] +
+                                           ' +/- ' + ('?' if pair['elo_margin'] is None else '%.1f' % pair['elo_margin'])))
@@ -1,4 +1,4 @@
-# SeekTruth.py : Classify text objects into two categories
+# SeekTruth.py : Classify text objects into categories
 #
 # Hari_Galla(hgalla),Rohan_Radhakrishnan_Athlur(rathlur),Venkata Vishwanath Chittilla(vchitti)
 #
@@ -7,6 +7,15 @@
 
 import sys
 import math 
+import json
+import mmap
+import zlib
+import array
+import operator
+from collections import Counter
+from functools import reduce
+
+import tokenizer
 
 def load_file(filename):
     objects=[]
@@ -19,134 +28,291 @@ def load_file(filename):
             
     return {"objects": objects, "labels": labels, "classes": list(set(labels))}
 
-#Compute parameters function finds the count of each word in the review and also the individial probability of each word for both decpective and truthful classes seperately.
-def computeParameters(inpData):
+#countTokens makes a single pass over (label, tokens) pairs, which can come from a generator so the reviews never have to be in memory all at once.
+#Every class gets a Counter of its words that is updated with the tokens of each review, so training time grows linearly with the size of the corpus.
+def countTokens(labelledTokens, classes):
+    countDict={}
+    for c in classes:
+        countDict[c]=Counter()
+    labelCount=Counter()
 
-    #ClassDict holds two types of classes as the keys and the values contain all the words in reviews belonging to each class
-    classDict={}
-    classDict[inpData["classes"][0]]=[]
-    classDict[inpData["classes"][1]]=[]
+    for (label, tokens) in labelledTokens:
+        countDict[label].update(tokens)
+        labelCount[label]+=1
 
-    #uniqueEleSet holds all the unique words present in the whole input file
-    uniqueEleSet=set()
+    return (countDict, labelCount)
 
-    for ele in inpData["objects"]:
-        tempWords=ele.split(" ")
-        tempSet=set(tempWords)
-        uniqueEleSet.update(tempSet)
-    
-    #splitting each review based on space and then adding all the splitted words into the class dict of the corresponding class    
-    for ele in range(len(inpData["labels"])):
-        if inpData["labels"][ele]==inpData["classes"][0]:
-            tempWords=inpData["objects"][ele].split(" ")
-            classDict[inpData["classes"][0]].extend(tempWords)
-        else:
-            tempWords=inpData["objects"][ele].split(" ")
-            classDict[inpData["classes"][1]].extend(tempWords)
-
-    #countDict dictonary has two keys corresponding to the two class types and for each class type it holds the count of each word occuring in that class 
-    countDict={}
-    countDict[inpData["classes"][0]]={}
-    countDict[inpData["classes"][1]]={}
 
-    for ele in uniqueEleSet:
-        
-        countDict[inpData["classes"][0]][ele]=classDict[inpData["classes"][0]].count(ele)
+#estimateParameters turns the counts into the individual probability of each word for each class and the probability of each class.
+def estimateParameters(countDict, labelCount, classes):
 
-    for ele in uniqueEleSet:
-        
-        countDict[inpData["classes"][1]][ele]=classDict[inpData["classes"][1]].count(ele)     
+    #uniqueEleSet holds all the unique words present in the whole input file
+    uniqueEleSet=set()
+    for c in classes:
+        uniqueEleSet.update(countDict[c])
 
-    #probDict dictonary also has two keys corresponding to the two class types and holds the probability of each word given that it belongs to a particular class
+    #probDict dictonary has a key for each class type and holds the probability of each word given that it belongs to a particular class
     #We also apply Laplace Smoothning to the probabilities so that one's with 0 probailities dont have a bias
     probDict={}
-    probDict[inpData["classes"][0]]={}
-    probDict[inpData["classes"][1]]={}
-
-    for (key,value) in countDict[inpData["classes"][0]].items():
-        probDict[inpData["classes"][0]][key]=math.log((value+1)/(len(classDict[inpData["classes"][0]])+(1*len(uniqueEleSet))))
-    
-    for (key,value) in countDict[inpData["classes"][1]].items():
-        probDict[inpData["classes"][1]][key]=math.log((value+1)/(len(classDict[inpData["classes"][1]])+(1*len(uniqueEleSet))))
-
+    for c in classes:
+        classCount=countDict[c]
+        denominator=sum(classCount.values())+(1*len(uniqueEleSet))
+        probDict[c]={}
+        for ele in uniqueEleSet:
+            probDict[c][ele]=math.log((classCount[ele]+1)/denominator)
 
     #mainProb Dictonary holds the probability of each class type(Deceptive or truthful)
     mainProb={}
-
-    mainProb[inpData["classes"][0]]=inpData['labels'].count(inpData["classes"][0])/(len(inpData['labels']))
-    mainProb[inpData["classes"][1]]=inpData['labels'].count(inpData["classes"][1])/(len(inpData['labels']))
+    total=sum(labelCount.values())
+    for c in classes:
+        mainProb[c]=labelCount[c]/total
 
     return(probDict,mainProb)
 
 
-def classifier(train_data, test_data):
-    for pos in range(len(train_data["objects"])):
-        train_data["objects"][pos]=train_data["objects"][pos].replace('~', '').replace("'", '').replace('`', '').replace('!', '').replace('@', '').replace('#', '').replace('$', '').replace('%', '').replace('^', '').replace('&', '').replace('*', '').replace('(', '').replace(')', '').replace('-', '').replace('_', '').replace('+', '').replace('=', '').replace('{', '').replace('}', '').replace('[', '').replace(']', '').replace(':', '').replace(';', '').replace('"', '').replace('<', '').replace(',', '').replace('>', '').replace('.', '').replace('?', '').replace('/', '').replace('|', '').replace('\\', '').lower() 
-    
-    for pos in range(len(test_data["objects"])):
-        test_data["objects"][pos]=test_data["objects"][pos].replace('~', '').replace("'", '').replace('`', '').replace('!', '').replace('@', '').replace('#', '').replace('$', '').replace('%', '').replace('^', '').replace('&', '').replace('*', '').replace('(', '').replace(')', '').replace('-', '').replace('_', '').replace('+', '').replace('=', '').replace('{', '').replace('}', '').replace('[', '').replace(']', '').replace(':', '').replace(';', '').replace('"', '').replace('<', '').replace(',', '').replace('>', '').replace('.', '').replace('?', '').replace('/', '').replace('|', '').replace('\\', '').lower()
-    
+#Compute parameters function finds the count of each word in the review and also the individial probability of each word for both decpective and truthful classes seperately.
+def computeParameters(inpData, tokenize=tokenizer.tokenize):
+    #each review is tokenized as it is counted, so only the words of one review are held at a time
+    labelledTokens=zip(inpData["labels"], (tokenize(ele) for ele in inpData["objects"]))
+    (countDict, labelCount)=countTokens(labelledTokens, inpData["classes"])
+
+    return estimateParameters(countDict, labelCount, inpData["classes"])
+
+
+#The reviews are turned into words by a tokenizer (see tokenizer.py): by default the punctuation is removed, the text is
+#converted to lower case and split on spaces
+def classifier(train_data, test_data, tokenize=tokenizer.tokenize):
     #Here we get the output from the computeParameters wherein we get the individual probabilities of words and the probability of each class type
-    (probDict,mainProb)=computeParameters(train_data)
+    (probDict,mainProb)=computeParameters(train_data, tokenize)
+
+    return classifyTestData(probDict, mainProb, test_data, tokenize)
+
+
+#Large test sets are scored with one sparse matrix product when NumPy and SciPy are installed (see batch_score.py), with the same results.
+#Smaller ones are not worth the time it takes to import them.
+BATCH_MIN_REVIEWS=10000
+
+
+def classifyTestData(probDict, mainProb, test_data, tokenize=tokenizer.tokenize):
+    if len(test_data["objects"])>=BATCH_MIN_REVIEWS:
+        import batch_score
+        if batch_score.available():
+            return batch_score.classifyReviewsBatch(probDict, mainProb, test_data, classifyReviews, tokenize)
+    return classifyReviews(probDict, mainProb, test_data, tokenize)
 
+
+#logProbTable holds the log-probabilities of each word for all the classes at once: a column of the K x V matrix of log-probabilities
+#(the classes are the rows, the words the columns), so that a review is scored for all the classes in one pass over its words.
+#All the classes of probDict have the same words, as computeParameters and modelProbDict return them.
+def logProbTable(probDict, classes):
+    vocabulary=list(probDict[classes[0]])
+    rows=[list(map(probDict[c].__getitem__, vocabulary)) for c in classes]
+    return dict(zip(vocabulary, zip(*rows)))
+
+
+#bestClass is the number of the class with the highest score, the last of them when several have it (with two classes, the first
+#class only wins when its score is greater)
+def bestClass(scores):
+    best=0
+    for k in range(1, len(scores)):
+        if scores[k]>=scores[best]:
+            best=k
+    return best
+
+
+#classifyReviews assigns a class to every review of the test data
+def classifyReviews(probDict, mainProb, test_data, tokenize=tokenizer.tokenize):
     words=[]
     for ele in test_data["objects"]:
-        words.append(ele.split(" "))
-    
+        words.append(list(tokenize(ele)))
 
-    #Applying Naive Bayes Theorem on each word , we calculate the probability it is the truth given the word & also the probability of deceptive given the word
-    #We multiply the probability of all the words in the review with the corresponding class type probability
+    classes=test_data["classes"]
+    table=logProbTable(probDict, classes)
+    logPrior=[math.log(mainProb[c]) for c in classes]
+    zeroRow=(0,)*len(classes)
 
-    spamProb=0
-    notSpamProb=0
+    #Applying Naive Bayes Theorem on each word, we calculate the probability of each class given the word
+    #We multiply the probability of all the words in the review with the corresponding class type probability
     resBool=[]
     for wrArr in words:
-        spamProb=0
-        notSpamProb=0
-        for wr in wrArr:
-            if wr in probDict[test_data["classes"][0]]: 
-            
-                spamProb=spamProb+(probDict[test_data["classes"][0]][wr])
-        
-        spamProb=spamProb+math.log(mainProb[test_data["classes"][0]])
+        #one row of log-probabilities per word the training has seen, after a row of zeros the sums start from
+        rows=[zeroRow]
+        rows.extend(table[wr] for wr in wrArr if wr in table)
+        #each class adds up its column in the order of the words and then its own log-probability, as one sum per class always has
+        scores=[reduce(operator.add, column)+prior for (column, prior) in zip(zip(*rows), logPrior)]
+        resBool.append(classes[bestClass(scores)])
 
-        
-        for wr in wrArr:
-            if wr in probDict[test_data["classes"][1]]:
-
-                notSpamProb=notSpamProb+(probDict[test_data["classes"][1]][wr])
-
-                
-        notSpamProb=notSpamProb+math.log(mainProb[test_data["classes"][1]])
-            
-        #Here we compare both the probabilities calculated.If the probability of truthful is grater than deceptive, then we assign the label Truthful else we assign the label as deceptive.
-        if spamProb>notSpamProb:
-            resBool.append(test_data["classes"][0])
-        else:
-            resBool.append(test_data["classes"][1])
+    return resBool
 
 
-    return resBool
+#The trained model can be saved in a compact binary file, so that it is trained once and loaded by any number of classifiers.
+#The file is the magic MODEL_MAGIC, the length of a JSON header (uint32) and the header (classes, class probabilities, options of
+#the tokenizer and the offsets of the sections from the first multiple of 8 after the header), followed by sections that start
+#on multiples of 8 bytes:
+#   slots    - hash index of the vocabulary: MODEL_SLOTS_FACTOR*V uint32 slots (rounded up to a power of 2) holding word number + 1,
+#              0 for an empty slot, filled by linear probing from the crc32 of the word
+#   offsets  - V+1 uint32 offsets of the words in the words section
+#   probs    - K*V float64 log-probabilities, the V words of the first class first
+#   words    - the UTF-8 words one after the other
+#The file is memory-mapped and the sections are read in place, so loading it takes the same time for any vocabulary
+#and the classifier processes share one copy of it through the page cache.
+MODEL_MAGIC=b'STM1'
+MODEL_SLOTS_FACTOR=2
+
+
+def modelSection(data):
+    return data+b'\0'*(-len(data)%8)
+
+
+def saveModel(filename, probDict, mainProb, classes, tokenizerOptions=tokenizer.DEFAULT_OPTIONS):
+    vocabulary=sorted(probDict[classes[0]])
+    slotCount=1
+    while slotCount<MODEL_SLOTS_FACTOR*len(vocabulary):
+        slotCount*=2
+
+    slots=array.array('I', [0])*slotCount
+    offsets=array.array('I', [0])
+    encodedWords=[]
+    length=0
+    for (number, word) in enumerate(vocabulary):
+        encoded=word.encode()
+        encodedWords.append(encoded)
+        length+=len(encoded)
+        offsets.append(length)
+        slot=zlib.crc32(encoded)&(slotCount-1)
+        while slots[slot]:
+            slot=(slot+1)&(slotCount-1)
+        slots[slot]=number+1
+
+    probs=array.array('d')
+    for c in classes:
+        probs.extend(probDict[c][word] for word in vocabulary)
+
+    sections=[modelSection(slots.tobytes()), modelSection(offsets.tobytes()), modelSection(probs.tobytes()), b''.join(encodedWords)]
+    sectionOffsets=[]
+    offset=0
+    for section in sections:
+        sectionOffsets.append(offset)
+        offset+=len(section)
+    header={"classes": classes, "mainProb": [mainProb[c] for c in classes], "vocabulary": len(vocabulary), "slots": slotCount,
+            "tokenizer": tokenizerOptions, "byteorder": sys.byteorder, "sections": sectionOffsets}
+
+    encodedHeader=json.dumps(header).encode()
+
+    with open(filename, "wb") as f:
+        f.write(modelSection(MODEL_MAGIC+len(encodedHeader).to_bytes(4, 'little')+encodedHeader))
+        for section in sections:
+            f.write(section)
+
+
+def loadModel(filename):
+    with open(filename, "rb") as f:
+        data=mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if data[:len(MODEL_MAGIC)]!=MODEL_MAGIC:
+        raise Exception("Not a SeekTruth model file: "+filename)
+    headerLength=int.from_bytes(data[len(MODEL_MAGIC):len(MODEL_MAGIC)+4], 'little')
+    header=json.loads(data[len(MODEL_MAGIC)+4:len(MODEL_MAGIC)+4+headerLength])
+    if header["byteorder"]!=sys.byteorder:
+        raise Exception("The model was saved on a machine with a different byte order")
+
+    headerEnd=len(MODEL_MAGIC)+4+headerLength
+    (slotsStart, offsetsStart, probsStart, wordsStart)=[headerEnd+(-headerEnd%8)+offset for offset in header["sections"]]
+    view=memoryview(data)
+    V=header["vocabulary"]
+    return {"classes": header["classes"], "mainProb": dict(zip(header["classes"], header["mainProb"])), "vocabulary": V,
+            "tokenizer": header.get("tokenizer", tokenizer.DEFAULT_OPTIONS),
+            "slots": view[slotsStart:slotsStart+4*header["slots"]].cast('I'),
+            "offsets": view[offsetsStart:offsetsStart+4*(V+1)].cast('I'),
+            "probs": view[probsStart:probsStart+8*V*len(header["classes"])].cast('d'),
+            "wordsStart": wordsStart, "mmap": data}
+
+
+#modelWordIndex finds the number of a word in the vocabulary of the model, or -1 when the model has not seen it
+def modelWordIndex(model, word):
+    encoded=word.encode()
+    slots=model["slots"]
+    offsets=model["offsets"]
+    mask=len(slots)-1
+    slot=zlib.crc32(encoded)&mask
+    while slots[slot]:
+        number=slots[slot]-1
+        start=model["wordsStart"]+offsets[number]
+        end=model["wordsStart"]+offsets[number+1]
+        if end-start==len(encoded) and model["mmap"][start:end]==encoded:
+            return number
+        slot=(slot+1)&mask
+    return -1
+
+
+#modelProbDict reads the probabilities of the given words from the model, in the same form as computeParameters returns them
+def modelProbDict(model, words):
+    probDict={}
+    for c in model["classes"]:
+        probDict[c]={}
+    V=model["vocabulary"]
+    for word in words:
+        number=modelWordIndex(model, word)
+        if number>=0:
+            for (k, c) in enumerate(model["classes"]):
+                probDict[c][word]=model["probs"][k*V+number]
+    return (probDict, model["mainProb"])
+
+
+#The options of the tokenizer are saved with the model, so that the test reviews are tokenized the same way
+def trainModelFile(train_file, model_file, tokenizerOptions=tokenizer.DEFAULT_OPTIONS):
+    train_data=load_file(train_file)
+    (probDict,mainProb)=computeParameters(train_data, tokenizer.makeTokenizer(**tokenizerOptions))
+    saveModel(model_file, probDict, mainProb, train_data["classes"], tokenizerOptions)
+
+
+#Every review is tokenized once: its words are looked up in the model and then classified
+def classifyWithModel(model, test_data):
+    tokenize=tokenizer.makeTokenizer(**model["tokenizer"])
+    tokenLists=[list(tokenize(ele)) for ele in test_data["objects"]]
+    testWords=set()
+    for tokens in tokenLists:
+        testWords.update(tokens)
+    (probDict,mainProb)=modelProbDict(model, testWords)
+    return classifyTestData(probDict, mainProb, {"objects": tokenLists, "classes": test_data["classes"]}, iter)
+
+
+def printAccuracy(results, test_data):
+    # calculate accuracy
+    correct_ct = sum([ (results[i] == test_data["labels"][i]) for i in range(0, len(test_data["labels"])) ])
+    print("Classification accuracy = %5.2f%%" % (100.0 * correct_ct / len(test_data["labels"])))
 
 
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        raise Exception("Usage: classify.py train_file.txt test_file.txt")
+    if len(sys.argv) >= 4 and sys.argv[1] == "train":
+        trainModelFile(sys.argv[2], sys.argv[3], tokenizer.parseOptions(sys.argv[4:]))
+        sys.exit(0)
+
+    if len(sys.argv) == 4 and sys.argv[1] == "classify":
+        (_, _, model_file, test_file) = sys.argv
+        model = loadModel(model_file)
+        test_data = load_file(test_file)
+        if not set(test_data["classes"]) <= set(model["classes"]):
+            raise Exception("The test data must not have classes the model does not know")
+        # the classes of the model in the order of the test data, as when training and testing in one run
+        test_data_sanitized = {"objects": test_data["objects"], "classes": test_data["classes"] + [c for c in model["classes"] if c not in test_data["classes"]]}
+        printAccuracy(classifyWithModel(model, test_data_sanitized), test_data)
+        sys.exit(0)
 
+    if len(sys.argv) != 3:
+        raise Exception("Usage: SeekTruth.py train_file.txt test_file.txt | SeekTruth.py train train_file.txt model_file [tokenizer options] | SeekTruth.py classify model_file test_file.txt")
     (_, train_file, test_file) = sys.argv
     # Load in the training and test datasets. The file format is simple: one object
     # per line, the first word one the line is the label.
     train_data = load_file(train_file)
     test_data = load_file(test_file)
     
-    if(sorted(train_data["classes"]) != sorted(test_data["classes"]) or len(test_data["classes"]) != 2):
-        raise Exception("Number of classes should be 2, and must be the same in test and training data")
+    if not set(test_data["classes"]) <= set(train_data["classes"]):
+        raise Exception("The test data must not have classes the training data does not have")
 
     # make a copy of the test data without the correct labels, so the classifier can't cheat!
-    test_data_sanitized = {"objects": test_data["objects"], "classes": test_data["classes"]}
+    # (any number of classes: those of the test data first, in their order, then the others of the training data)
+    test_data_sanitized = {"objects": test_data["objects"], "classes": test_data["classes"] + [c for c in train_data["classes"] if c not in test_data["classes"]]}
 
     results= classifier(train_data, test_data_sanitized)
 
-    # calculate accuracy
-    correct_ct = sum([ (results[i] == test_data["labels"][i]) for i in range(0, len(test_data["labels"])) ])
-    print("Classification accuracy = %5.2f%%" % (100.0 * correct_ct / len(test_data["labels"])))
+    printAccuracy(results, test_data)
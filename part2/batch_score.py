@@ -0,0 +1,102 @@
+#
+# batch_score.py : Score many reviews at once with a sparse matrix product (NumPy and SciPy)
+#
+# The reviews are encoded as a sparse bag-of-words matrix (CSR: one row per review, one column per word of
+# the vocabulary, holding how often the word occurs), and the log-likelihoods of all the reviews for all
+# the classes are one product with the dense vocabulary x classes matrix of log-probabilities.
+#
+# The product adds the log-probabilities in a different order than classifyReviews in SeekTruth.py, so the
+# scores can differ in the last bits. The predictions still match exactly: a review whose best score is not
+# further from another score than the rounding errors of the two sums is scored again word by word, with the
+# classifyReviews function the caller passes in (so that this module does not import SeekTruth.py, which imports it).
+#
+# NumPy and SciPy are optional: SeekTruth.py only uses this module for large test sets when they are installed.
+#
+import math
+import itertools
+
+try:
+    import numpy as np
+    import scipy.sparse
+except ImportError:
+    np = None
+
+import tokenizer
+
+
+def available():
+    return np is not None
+
+
+def requireScipy():
+    if np is None:
+        raise Exception("Batch scoring needs NumPy and SciPy (pip install numpy scipy)")
+
+
+def logProbMatrix(probDict, classes):
+    '''
+    The vocabulary as a dict from word to column, and the log-probabilities as a vocabulary x classes array
+    '''
+    requireScipy()
+    vocabulary = list(probDict[classes[0]])
+    index = {word: column for (column, word) in enumerate(vocabulary)}
+    logProb = np.empty((len(vocabulary), len(classes)))
+    for (k, c) in enumerate(classes):
+        logProb[:, k] = np.fromiter((probDict[c][word] for word in vocabulary), dtype=np.float64, count=len(vocabulary))
+    return (index, logProb)
+
+
+def encodeReviews(tokenLists, index):
+    '''
+    The bag-of-words CSR matrix of the reviews (lists of words) over the vocabulary index. The words
+    that are not in the vocabulary are left out, as classifyReviews leaves them out.
+    '''
+    requireScipy()
+    # All the words are looked up in one pass (map calls index.get without a Python loop), -1 when missing
+    words = list(itertools.chain.from_iterable(tokenLists))
+    columns = np.fromiter(map(index.get, words, itertools.repeat(-1, len(words))), dtype=np.int64, count=len(words))
+    lengths = np.fromiter(map(len, tokenLists), dtype=np.int64, count=len(tokenLists))
+    rows = np.repeat(np.arange(len(tokenLists)), lengths)
+    known = columns >= 0
+    # the same word twice in a review is added up in one entry
+    return scipy.sparse.coo_matrix((np.ones(int(known.sum())), (rows[known], columns[known])),
+                                   shape=(len(tokenLists), len(index))).tocsr()
+
+
+def scoreReviews(matrix, logProb, logPrior):
+    '''
+    The log-likelihood of every review (row of the matrix) for every class: a reviews x classes array
+    '''
+    return matrix @ logProb + logPrior
+
+
+def classifyReviewsBatch(probDict, mainProb, test_data, classifyReviews, tokenize=tokenizer.tokenize):
+    '''
+    The same classes as classifyReviews (SeekTruth.classifyReviews), computed with one sparse matrix product
+    '''
+    requireScipy()
+    classes = test_data["classes"]
+    (index, logProb) = logProbMatrix(probDict, classes)
+    logPrior = np.array([math.log(mainProb[c]) for c in classes])
+    tokenLists = [list(tokenize(ele)) for ele in test_data["objects"]]
+    matrix = encodeReviews(tokenLists, index)
+    scores = scoreReviews(matrix, logProb, logPrior)
+
+    # A sum of n terms in any order is within about n*eps*(sum of their absolute values) of the exact sum.
+    # All the log-probabilities are negative, so the sum of their absolute values is -score.
+    terms = np.diff(matrix.indptr) + np.asarray(matrix.sum(axis=1)).ravel() + 2
+    bound = 2 * terms[:, None] * np.finfo(np.float64).eps * np.abs(scores)
+    results = np.argmax(scores, axis=1)
+    rows = np.arange(len(scores))
+    # The best class is uncertain when another class is as close to it as their rounding errors (which takes in the ties)
+    close = scores[rows, results][:, None] - scores <= bound[rows, results][:, None] + bound
+    close[rows, results] = False
+    uncertain = np.flatnonzero(close.any(axis=1))
+
+    resBool = [classes[k] for k in results]
+    if len(uncertain):
+        exact = classifyReviews(probDict, mainProb, {"objects": [tokenLists[pos] for pos in uncertain],
+                                                     "classes": classes}, iter)
+        for (pos, label) in zip(uncertain, exact):
+            resBool[pos] = label
+    return resBool
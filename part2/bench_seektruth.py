@@ -0,0 +1,210 @@
+#
+# bench_seektruth.py : Benchmarks for the SeekTruth classifier
+#
+# Usage: python3 bench_seektruth.py train [sizes]
+#        python3 bench_seektruth.py model [sizes]
+#        python3 bench_seektruth.py tokenize [megabytes]
+#        python3 bench_seektruth.py score [reviews] [classes]
+#
+# train - train on synthetic reviews (10k, 100k and 1M by default, e.g. 10000,100000) streamed from a
+#         generator, and print the time per review, which stays the same when the training is linear
+# model - save models with vocabularies of 10k, 100k and 1M words (by default) to model files, and time
+#         loading them and looking words up in them
+# tokenize - tokenize the training reviews (repeated up to 20 MB by default) with the chain of str.replace
+#         calls SeekTruth.py used to have and with the tokenizers of tokenizer.py, check that the default
+#         tokenizer gives the same words, and print the MB/s of each
+# score - train on synthetic reviews of 2 classes (by default) and classify 100k others (by default) word by word
+#         and with the sparse matrix product of batch_score.py, check that the predictions are the same and print
+#         the reviews/s
+#
+import sys
+import os
+import time
+import random
+import tempfile
+
+import SeekTruth
+import tokenizer
+
+# Synthetic reviews: words from a vocabulary with Zipf-like frequencies, like the words of real reviews
+SYNTHETIC_VOCABULARY = 50000
+SYNTHETIC_LENGTH = (20, 200)
+SYNTHETIC_CLASSES = ['deceptive', 'truthful']
+
+# Reviews that are generated up front; longer streams cycle through them
+SYNTHETIC_POOL = 20000
+
+
+def syntheticPool(seed=0, classes=SYNTHETIC_CLASSES):
+    '''
+    A pool of (label, review) pairs. Each class draws the words with a slightly different frequency order,
+    which depends on the name of the class but not on the seed, so pools of different seeds can train and test.
+    '''
+    rng = random.Random(seed)
+    words = ['w%d' % k for k in range(SYNTHETIC_VOCABULARY)]
+    weights = [1.0 / (rank + 1) for rank in range(SYNTHETIC_VOCABULARY)]
+    classWords = {}
+    for c in classes:
+        classWords[c] = words[:]
+        classRng = random.Random(c)
+        for k in range(0, SYNTHETIC_VOCABULARY, 100):
+            block = classWords[c][k:k+100]
+            classRng.shuffle(block)
+            classWords[c][k:k+100] = block
+    cumWeights = []
+    total = 0
+    for weight in weights:
+        total += weight
+        cumWeights.append(total)
+
+    pool = []
+    for _ in range(SYNTHETIC_POOL):
+        label = rng.choice(classes)
+        length = rng.randint(*SYNTHETIC_LENGTH)
+        pool.append((label, ' '.join(rng.choices(classWords[label], cum_weights=cumWeights, k=length))))
+    return pool
+
+
+def syntheticReviews(pool, count):
+    '''
+    Yield count (label, review) pairs from the pool
+    '''
+    for k in range(count):
+        yield pool[k % len(pool)]
+
+
+def benchTrain(sizes):
+    pool = syntheticPool()
+    print('%10s %12s %10s %10s %10s %14s' % ('reviews', 'tokens', 'vocabulary', 'count', 'estimate',
+                                            'us per review'))
+    for size in sizes:
+        tokens = [0]
+
+        def labelledTokens():
+            for (label, review) in syntheticReviews(pool, size):
+                words = review.split(" ")
+                tokens[0] += len(words)
+                yield (label, words)
+
+        start = time.time()
+        (countDict, labelCount) = SeekTruth.countTokens(labelledTokens(), SYNTHETIC_CLASSES)
+        countTime = time.time() - start
+        start = time.time()
+        (probDict, mainProb) = SeekTruth.estimateParameters(countDict, labelCount, SYNTHETIC_CLASSES)
+        estimateTime = time.time() - start
+        print('%10d %12d %10d %9.2fs %9.2fs %14.2f' % (size, tokens[0], len(probDict[SYNTHETIC_CLASSES[0]]),
+                                                       countTime, estimateTime,
+                                                       1e6 * (countTime + estimateTime) / size))
+
+
+# Words looked up in every model by benchModel, half of them in the vocabulary
+MODEL_LOOKUPS = 100000
+
+
+def benchModel(sizes):
+    rng = random.Random(0)
+    print('%10s %12s %10s %10s %14s' % ('vocabulary', 'file bytes', 'save', 'load', 'us per lookup'))
+    for size in sizes:
+        vocabulary = ['w%d' % k for k in range(size)]
+        probDict = {}
+        for c in SYNTHETIC_CLASSES:
+            probDict[c] = {word: -rng.expovariate(0.1) for word in vocabulary}
+        mainProb = {c: 1.0 / len(SYNTHETIC_CLASSES) for c in SYNTHETIC_CLASSES}
+        lookups = ['w%d' % rng.randrange(2 * size) for _ in range(MODEL_LOOKUPS)]
+
+        (handle, filename) = tempfile.mkstemp(suffix='.model')
+        os.close(handle)
+        try:
+            start = time.time()
+            SeekTruth.saveModel(filename, probDict, mainProb, SYNTHETIC_CLASSES)
+            saveTime = time.time() - start
+            start = time.time()
+            model = SeekTruth.loadModel(filename)
+            loadTime = time.time() - start
+            start = time.time()
+            for word in lookups:
+                SeekTruth.modelWordIndex(model, word)
+            lookupTime = time.time() - start
+            print('%10d %12d %9.2fs %8.2fms %14.2f' % (size, os.path.getsize(filename), saveTime, 1000 * loadTime,
+                                                       1e6 * lookupTime / len(lookups)))
+            del model
+        finally:
+            os.remove(filename)
+
+
+def replaceChain(text):
+    '''
+    The normalization SeekTruth.py had before tokenizer.py: one str.replace per punctuation character
+    '''
+    return text.replace('~', '').replace("'", '').replace('`', '').replace('!', '').replace('@', '').replace('#', '').replace('$', '').replace('%', '').replace('^', '').replace('&', '').replace('*', '').replace('(', '').replace(')', '').replace('-', '').replace('_', '').replace('+', '').replace('=', '').replace('{', '').replace('}', '').replace('[', '').replace(']', '').replace(':', '').replace(';', '').replace('"', '').replace('<', '').replace(',', '').replace('>', '').replace('.', '').replace('?', '').replace('/', '').replace('|', '').replace('\\', '').lower()
+
+
+def benchTokenize(megabytes, trainFile='deceptive.train.txt'):
+    reviews = SeekTruth.load_file(trainFile)["objects"]
+    # Every character the tokenizer treats specially, plus text that changes under lower()
+    reviews.append(tokenizer.PUNCTUATION + ' ' + tokenizer.DIGITS + '  A  \u0130X\u00c9 x--y')
+    for review in reviews:
+        if list(tokenizer.tokenize(review)) != replaceChain(review).split(" "):
+            raise Exception("The default tokenizer differs from the replace chain for: " + review)
+
+    size = sum(len(review.encode()) for review in reviews)
+    corpus = reviews * max(1, int(megabytes * 1e6 / size))
+    megabytes = size * (len(corpus) // len(reviews)) / 1e6
+    tokenizers = [
+        ('replace chain', lambda text: replaceChain(text).split(" ")),
+        ('default', tokenizer.tokenize),
+        ('stopwords', tokenizer.makeTokenizer(stopwords=tokenizer.ENGLISH_STOPWORDS)),
+        ('ngrams=2', tokenizer.makeTokenizer(ngrams=2)),
+        ('digits, empty', tokenizer.makeTokenizer(digits='collapse', empty='drop')),
+    ]
+    print('%.1f MB of reviews, the default tokenizer gives the same words as the replace chain' % megabytes)
+    print('%-14s %12s %10s %10s' % ('tokenizer', 'words', 'time', 'MB/s'))
+    for (name, tokenize) in tokenizers:
+        start = time.time()
+        words = 0
+        for review in corpus:
+            words += len(list(tokenize(review)))
+        seconds = time.time() - start
+        print('%-14s %12d %9.2fs %10.1f' % (name, words, seconds, megabytes / seconds))
+
+
+def benchScore(reviews, classCount):
+    import batch_score
+    batch_score.requireScipy()
+    classes = SYNTHETIC_CLASSES if classCount == 2 else ['c%d' % k for k in range(classCount)]
+    pool = syntheticPool(classes=classes)
+    (countDict, labelCount) = SeekTruth.countTokens(((label, review.split(" ")) for (label, review) in pool), classes)
+    (probDict, mainProb) = SeekTruth.estimateParameters(countDict, labelCount, classes)
+    test = syntheticPool(seed=1, classes=classes)
+    # The reviews are split into words up front, so that only the scoring is timed
+    test_data = {"objects": [test[k % len(test)][1].split(" ") for k in range(reviews)], "classes": classes}
+
+    start = time.time()
+    perWord = SeekTruth.classifyReviews(probDict, mainProb, test_data, iter)
+    perWordTime = time.time() - start
+    start = time.time()
+    batch = batch_score.classifyReviewsBatch(probDict, mainProb, test_data, SeekTruth.classifyReviews, iter)
+    batchTime = time.time() - start
+    if batch != perWord:
+        raise Exception("The batch predictions differ from the word by word predictions in %d reviews" %
+                        sum(a != b for (a, b) in zip(batch, perWord)))
+    accuracy = sum(label == test[k % len(test)][0] for (k, label) in enumerate(batch)) / reviews
+    print('%d reviews (%d words), %d classes, the predictions are the same, %.2f%% correct' % (
+        reviews, sum(map(len, test_data["objects"])), len(classes), 100 * accuracy))
+    print('word by word %8.2fs %10d reviews/s' % (perWordTime, reviews / perWordTime))
+    print('batch        %8.2fs %10d reviews/s  %.1fx' % (batchTime, reviews / batchTime, perWordTime / batchTime))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in ('train', 'model', 'tokenize', 'score'):
+        raise Exception("Usage: bench_seektruth.py train [sizes] | bench_seektruth.py model [sizes] | "
+                        "bench_seektruth.py tokenize [megabytes] | bench_seektruth.py score [reviews] [classes]")
+
+    if sys.argv[1] == 'train':
+        benchTrain([int(size) for size in sys.argv[2].split(',')] if len(sys.argv) > 2 else [10000, 100000, 1000000])
+    elif sys.argv[1] == 'model':
+        benchModel([int(size) for size in sys.argv[2].split(',')] if len(sys.argv) > 2 else [10000, 100000, 1000000])
+    elif sys.argv[1] == 'tokenize':
+        benchTokenize(float(sys.argv[2]) if len(sys.argv) > 2 else 20)
+    elif sys.argv[1] == 'score':
+        benchScore(int(sys.argv[2]) if len(sys.argv) > 2 else 100000, int(sys.argv[3]) if len(sys.argv) > 3 else 2)
@@ -0,0 +1,123 @@
+#
+# tokenizer.py : Turn the text of a review into the words that SeekTruth.py counts
+#
+# The default tokenizer is the one SeekTruth.py has always used: the punctuation is deleted, the text is
+# converted to lower case and split on single spaces (so two spaces in a row give an empty word, which is
+# counted like any other). It deletes all the punctuation with one translate call instead of a
+# str.replace call per character: bytes.translate for ASCII text (most reviews), which is about three
+# times as fast as str.translate, and str.translate for the rest.
+#
+# A tokenizer returns an iterator over the words of one review. The review is normalized and split as a whole (one
+# translate and one split call are much faster than going through it word by word), so its words are in a list
+# behind the iterator; what is streamed is the reviews, one at a time (see computeParameters in SeekTruth.py).
+# The tokenizers of makeTokenizer are generators that yield the n-grams as they are joined.
+#
+# makeTokenizer builds tokenizers with options:
+#   stopwords  - words to leave out (after lower case), e.g. ENGLISH_STOPWORDS
+#   ngrams     - also give the sequences of 2 .. ngrams words, joined by a space
+#   digits     - 'keep' the digits, 'remove' them or 'collapse' every digit to 0 (so 1999 and 2004 are one word)
+#   empty      - 'keep' the empty words or 'drop' them
+# The options are plain values, so they can be stored with a model (see parseOptions).
+#
+import re
+
+# Characters deleted from the reviews
+PUNCTUATION = "~'`!@#$%^&*()-_+={}[]:;\"<,>.?/|\\"
+DIGITS = '0123456789'
+
+DEFAULT_OPTIONS = {'stopwords': None, 'ngrams': 1, 'digits': 'keep', 'empty': 'keep'}
+
+ENGLISH_STOPWORDS = ['a', 'about', 'an', 'and', 'are', 'as', 'at', 'be', 'but', 'by', 'for', 'from', 'had', 'has',
+                     'have', 'he', 'her', 'his', 'i', 'in', 'is', 'it', 'its', 'me', 'my', 'of', 'on', 'or', 'our',
+                     'she', 'so', 'that', 'the', 'their', 'them', 'there', 'they', 'this', 'to', 'was', 'we', 'were',
+                     'what', 'when', 'which', 'who', 'will', 'with', 'you', 'your']
+
+
+def makeNormalizer(digits='keep'):
+    '''
+    Return a function that deletes the punctuation from a text (and handles the digits) and converts it to lower case
+    '''
+    if digits == 'keep':
+        (fromDigits, toDigits, delete) = ('', '', PUNCTUATION)
+    elif digits == 'remove':
+        (fromDigits, toDigits, delete) = ('', '', PUNCTUATION + DIGITS)
+    elif digits == 'collapse':
+        (fromDigits, toDigits, delete) = (DIGITS, '0' * len(DIGITS), PUNCTUATION)
+    else:
+        raise Exception("Unknown digits option " + digits + " (keep, remove or collapse)")
+    table = str.maketrans(fromDigits, toDigits, delete)
+    bytesTable = bytes.maketrans(fromDigits.encode(), toDigits.encode())
+    bytesDelete = delete.encode()
+
+    def normalizeText(text):
+        # bytes.lower only changes A-Z, which is all str.lower changes in ASCII text
+        if text.isascii():
+            return text.encode().translate(bytesTable, bytesDelete).lower().decode()
+        return text.translate(table).lower()
+
+    return normalizeText
+
+
+normalize = makeNormalizer()
+
+
+def tokenize(text):
+    '''
+    The default tokenizer: an iterator over the list of the words of the normalized text, split on single spaces
+    '''
+    return iter(normalize(text).split(" "))
+
+
+def makeTokenizer(stopwords=None, ngrams=1, digits='keep', empty='keep'):
+    '''
+    Return a function that takes the text of a review and yields its words with the given options.
+    Without options it is tokenize.
+    '''
+    if empty not in ('keep', 'drop'):
+        raise Exception("Unknown empty option " + empty + " (keep or drop)")
+    if ngrams < 1:
+        raise Exception("ngrams should be at least 1")
+    if stopwords is None and ngrams == 1 and digits == 'keep' and empty == 'keep':
+        return tokenize
+
+    normalizeText = makeNormalizer(digits)
+    leaveOut = set(stopwords or [])
+    if empty == 'drop':
+        leaveOut.add('')
+
+    def optionTokenize(text):
+        words = normalizeText(text).split(" ")
+        if leaveOut:
+            words = [word for word in words if word not in leaveOut]
+        yield from words
+        for n in range(2, ngrams + 1):
+            for start in range(len(words) - n + 1):
+                yield ' '.join(words[start:start + n])
+
+    return optionTokenize
+
+
+def parseOptions(arguments):
+    '''
+    Options for makeTokenizer from command line arguments like "ngrams=2", "digits=remove", "empty=drop" and
+    "stopwords=english" (the built-in list) or "stopwords=file" (one word per line)
+    '''
+    options = dict(DEFAULT_OPTIONS)
+    for argument in arguments:
+        match = re.fullmatch(r'(\w+)=(.*)', argument)
+        if match is None or match.group(1) not in options:
+            raise Exception("Unknown tokenizer option " + argument + " (" + ", ".join(options) + ")")
+        (name, value) = match.groups()
+        if name == 'ngrams':
+            options[name] = int(value)
+        elif name == 'stopwords':
+            if value == 'english':
+                options[name] = list(ENGLISH_STOPWORDS)
+            else:
+                with open(value, "r") as f:
+                    options[name] = sorted(set(normalize(line.strip()) for line in f if line.strip()))
+        else:
+            options[name] = value
+    # Check the values before they are stored
+    makeTokenizer(**options)
+    return options